@@ -0,0 +1,183 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Serves POST /openai/v1/chat/completions, streaming and non-streaming, with a
+configurable time to first token, token rate and injected errors, so the app can
+be load-tested without network access or Groq quota. Point the app at it with
+GROQ_API_BASE=http://127.0.0.1:<port>.
+
+Run from the backend directory:
+    python -m benchmarks.fake_groq --port 8901 --latency-ms 300 --tokens-per-second 250 --error-rate 0.01
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from typing import Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Settings, overridable from the command line
+FAKE_GROQ_LATENCY_MS = float(os.getenv("FAKE_GROQ_LATENCY_MS", "300"))
+FAKE_GROQ_TOKENS_PER_SECOND = float(os.getenv("FAKE_GROQ_TOKENS_PER_SECOND", "250"))
+FAKE_GROQ_COMPLETION_TOKENS = int(os.getenv("FAKE_GROQ_COMPLETION_TOKENS", "200"))
+FAKE_GROQ_ERROR_RATE = float(os.getenv("FAKE_GROQ_ERROR_RATE", "0"))
+FAKE_GROQ_RATE_LIMIT_RATE = float(os.getenv("FAKE_GROQ_RATE_LIMIT_RATE", "0"))
+
+# Canned JSON for the CV and cover-letter extraction prompts, which parse the answer
+CV_JSON = {
+    "name": "Ama Mensah",
+    "email": "ama.mensah@example.com",
+    "phone": "+233 20 000 0000",
+    "current_role": "Software Engineer",
+    "years_experience": 5,
+    "skills": ["Python", "FastAPI", "SQL"],
+    "key_skills": ["Python", "FastAPI", "SQL"],
+    "education": "BSc Computer Science, University of Ghana",
+    "experience": [],
+    "achievements": ["Shipped a payments platform"],
+    "summary": "Backend engineer",
+    "strengths": ["Clear experience section"],
+    "weaknesses": ["Few metrics"],
+    "recommendations": ["Quantify achievements"],
+    "keywords": ["microservices"],
+    "rating": 7
+}
+
+WORDS = "Ghana is known for its rich culture , kente cloth , jollof rice and warm hospitality .".split()
+
+app = FastAPI(title="Fake Groq")
+stats = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0}
+
+
+def _prompt_text(messages: List[Dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _completion_tokens(prompt: str, max_tokens: int) -> List[str]:
+    """Answer tokens: canned JSON for extraction prompts, filler prose otherwise"""
+    if "JSON" in prompt:
+        return [json.dumps(CV_JSON)]
+    count = min(max_tokens, FAKE_GROQ_COMPLETION_TOKENS)
+    return [WORDS[i % len(WORDS)] + " " for i in range(count)]
+
+
+def _usage(prompt: str, tokens: List[str]) -> Dict:
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(tokens)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    model = body.get("model", "llama3-70b-8192")
+
+    roll = random.random()
+    if roll < FAKE_GROQ_RATE_LIMIT_RATE:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": "1"},
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+        )
+    if roll < FAKE_GROQ_RATE_LIMIT_RATE + FAKE_GROQ_ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"message": "Injected failure", "type": "internal_server_error"}}
+        )
+
+    prompt = _prompt_text(body.get("messages", []))
+    tokens = _completion_tokens(prompt, body.get("max_tokens") or FAKE_GROQ_COMPLETION_TOKENS)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    token_delay = 1.0 / FAKE_GROQ_TOKENS_PER_SECOND if FAKE_GROQ_TOKENS_PER_SECOND > 0 else 0.0
+
+    await asyncio.sleep(FAKE_GROQ_LATENCY_MS / 1000)
+
+    if body.get("stream"):
+        stats["streams"] += 1
+
+        def chunk(delta: Dict, finish_reason=None, usage=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            if usage is not None:
+                payload["x_groq"] = {"id": completion_id, "usage": usage}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def event_stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                await asyncio.sleep(token_delay)
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop", usage=_usage(prompt, tokens))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    await asyncio.sleep(token_delay * len(tokens))
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(tokens).strip()},
+            "finish_reason": "stop"
+        }],
+        "usage": _usage(prompt, tokens)
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def main():
+    global FAKE_GROQ_LATENCY_MS, FAKE_GROQ_TOKENS_PER_SECOND, FAKE_GROQ_COMPLETION_TOKENS
+    global FAKE_GROQ_ERROR_RATE, FAKE_GROQ_RATE_LIMIT_RATE
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=FAKE_GROQ_LATENCY_MS, help="Time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=FAKE_GROQ_TOKENS_PER_SECOND)
+    parser.add_argument("--completion-tokens", type=int, default=FAKE_GROQ_COMPLETION_TOKENS)
+    parser.add_argument("--error-rate", type=float, default=FAKE_GROQ_ERROR_RATE, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=FAKE_GROQ_RATE_LIMIT_RATE, help="Fraction of requests failing with 429")
+    args = parser.parse_args()
+
+    FAKE_GROQ_LATENCY_MS = args.latency_ms
+    FAKE_GROQ_TOKENS_PER_SECOND = args.tokens_per_second
+    FAKE_GROQ_COMPLETION_TOKENS = args.completion_tokens
+    FAKE_GROQ_ERROR_RATE = args.error_rate
+    FAKE_GROQ_RATE_LIMIT_RATE = args.rate_limit_rate
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
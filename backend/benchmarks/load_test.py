@@ -0,0 +1,367 @@
+"""
+End-to-end load test of the API against the local fake Groq server.
+
+By default this starts benchmarks.fake_groq and the app (uvicorn main:app, with
+GROQ_API_BASE pointed at the fake server and WEB_SEARCH_BACKEND=fake, so nothing
+leaves the machine), then drives each scenario at a fixed concurrency and reports
+p50/p95/p99 latency, throughput and the app's RSS.
+
+Scenarios: ghana_query, upload_qa, ask_qa, analyze_cv, cover_letter.
+
+Run from the backend directory:
+    python -m benchmarks.load_test --concurrency 8 --requests 200
+    python -m benchmarks.load_test --scenarios ghana_query,ask_qa --llm-latency-ms 500 --workers 2
+    python -m benchmarks.load_test --app-url http://127.0.0.1:8000 --app-pid 1234 --json results.json
+
+With --app-url the app (and its LLM endpoint) are not started; pass --app-pid to
+still sample its RSS.
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import zipfile
+import argparse
+import subprocess
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+import numpy as np
+import psutil
+
+SCENARIOS = ["ghana_query", "upload_qa", "ask_qa", "analyze_cv", "cover_letter"]
+
+QUESTIONS = [
+    "What does akwaaba mean?",
+    "Where is the Kakum canopy walkway?",
+    "What is kente cloth made from?",
+    "When is Ghana's independence day?",
+    "What is the capital of the Ashanti region?",
+    "How is jollof rice prepared in Ghana?",
+    "What languages are spoken in Ghana?",
+    "What is the Homowo festival?",
+    "Who was Kwame Nkrumah?",
+    "What currency does Ghana use?"
+]
+
+CV_TEXT = """Ama Mensah
+Software Engineer, Accra, Ghana. ama.mensah@example.com
+
+Experience
+Backend engineer at a fintech company (2020 - present): built payment APIs in
+Python and FastAPI, ran PostgreSQL and Redis in production, mentored two juniors.
+
+Education
+BSc Computer Science, University of Ghana, 2019.
+
+Skills
+Python, FastAPI, SQL, Docker, AWS, data pipelines, REST API design.
+"""
+
+
+def make_docx(text: str) -> bytes:
+    """Minimal .docx (what docx2txt reads) holding one paragraph per line"""
+    paragraphs = "".join(
+        f"<w:p><w:r><w:t xml:space=\"preserve\">{line}</w:t></w:r></w:p>" for line in text.splitlines()
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{paragraphs}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class RssSampler:
+    """Samples the resident set size of a process and its children (uvicorn workers)"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.2):
+        self.process = psutil.Process(pid) if pid else None
+        self.interval = interval
+        self.samples: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def rss(self) -> Optional[int]:
+        if self.process is None:
+            return None
+        try:
+            processes = [self.process] + self.process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes if p.is_running())
+        except psutil.Error:
+            return None
+
+    async def _run(self):
+        while True:
+            rss = self.rss()
+            if rss is not None:
+                self.samples.append(rss)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict[str, Optional[float]]:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        if not self.samples:
+            return {"rss_start_mb": None, "rss_end_mb": None, "rss_peak_mb": None}
+        mb = 1024 * 1024
+        return {
+            "rss_start_mb": round(self.samples[0] / mb, 1),
+            "rss_end_mb": round(self.samples[-1] / mb, 1),
+            "rss_peak_mb": round(max(self.samples) / mb, 1)
+        }
+
+
+class Scenarios:
+    """One coroutine per scenario, each sending a single request"""
+
+    def __init__(self, client: httpx.AsyncClient, unique_questions: bool, setup_timeout: float):
+        self.client = client
+        self.unique_questions = unique_questions
+        self.setup_timeout = setup_timeout
+        self.cv_docx = make_docx(CV_TEXT)
+        self.session_token: Optional[str] = None
+
+    def question(self, i: int) -> str:
+        question = QUESTIONS[i % len(QUESTIONS)]
+        # Unique questions defeat the semantic answer cache and measure the LLM path
+        return f"{question} (request {i})" if self.unique_questions else question
+
+    async def setup(self, scenario: str):
+        if scenario == "ask_qa":
+            response = await self.upload_qa(0)
+            response.raise_for_status()
+            if not any(result.get("success") for result in response.json().get("results", [])):
+                raise RuntimeError(f"ask_qa setup upload was rejected: {response.text}")
+            self.session_token = response.headers.get("X-Session-Token")
+            # Uploads are indexed in the background; wait until the CV is searchable
+            deadline = time.monotonic() + self.setup_timeout
+            while True:
+                status = await self.client.get("/status", headers={"X-Session-Token": self.session_token})
+                status.raise_for_status()
+                body = status.json()
+                failed = [job for job in body.get("files", []) if job.get("status") == "failed"]
+                if failed:
+                    raise RuntimeError(f"ask_qa setup upload failed to index: {failed[0].get('error')}")
+                if body.get("status") != "processing":
+                    break
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"ask_qa setup upload was not indexed within {self.setup_timeout}s")
+                await asyncio.sleep(0.2)
+            if body.get("status") != "ready":
+                raise RuntimeError(f"ask_qa setup upload left no searchable documents: {body}")
+
+    async def ghana_query(self, i: int) -> httpx.Response:
+        return await self.client.post("/ghana/query", json={"message": self.question(i)})
+
+    async def upload_qa(self, i: int) -> httpx.Response:
+        files = [("files", (f"cv-{i}.docx", self.cv_docx, DOCX_MIME))]
+        return await self.client.post("/upload-qa", files=files)
+
+    async def ask_qa(self, i: int) -> httpx.Response:
+        headers = {"X-Session-Token": self.session_token} if self.session_token else {}
+        data = {"question": f"What are the candidate's skills? (request {i})" if self.unique_questions
+                else "What are the candidate's skills?", "k": "4"}
+        return await self.client.post("/ask-qa", data=data, headers=headers)
+
+    async def analyze_cv(self, i: int) -> httpx.Response:
+        files = {"file": (f"cv-{i}.docx", self.cv_docx, DOCX_MIME)}
+        return await self.client.post("/analyze-cv", files=files, params={"top_n": 5})
+
+    async def cover_letter(self, i: int) -> httpx.Response:
+        files = {"cv_file": (f"cv-{i}.docx", self.cv_docx, DOCX_MIME)}
+        data = {"applying_role": "Backend Engineer", "company_name": "Hubtel", "tone": "professional"}
+        return await self.client.post("/generate-cover-letter", files=files, data=data)
+
+
+async def run_scenario(
+    send: Callable[[int], Awaitable[httpx.Response]],
+    requests: int,
+    concurrency: int,
+    sampler: RssSampler
+) -> Dict:
+    """Send `requests` requests with at most `concurrency` in flight and summarise them"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    next_request = 0
+
+    async def worker():
+        nonlocal next_request
+        while next_request < requests:
+            i = next_request
+            next_request += 1
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    sampler.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    memory = await sampler.stop()
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2") or status == "207")
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "elapsed_s": round(elapsed, 2),
+        **memory
+    }
+
+
+def wait_for(url: str, timeout: float, process: Optional[subprocess.Popen] = None):
+    """Poll a URL until it answers, failing early if the process exits"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=2)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+
+def start_servers(args, processes: List[subprocess.Popen]):
+    """Start the fake Groq server and then the app, appending each to processes as it starts"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_groq",
+        "--port", str(args.llm_port),
+        "--latency-ms", str(args.llm_latency_ms),
+        "--tokens-per-second", str(args.llm_tokens_per_second),
+        "--completion-tokens", str(args.llm_completion_tokens),
+        "--error-rate", str(args.llm_error_rate)
+    ], cwd=backend_dir)
+    processes.append(fake)
+    wait_for(f"http://127.0.0.1:{args.llm_port}/stats", 30, fake)
+
+    env = dict(os.environ)
+    env["GROQ_API_BASE"] = f"http://127.0.0.1:{args.llm_port}"
+    env["WEB_SEARCH_BACKEND"] = args.search_backend
+    env["WEB_SEARCH_FAKE_LATENCY_MS"] = str(args.search_latency_ms)
+    env.setdefault("GROQ_API_KEY", "gsk_load_test")
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(args.app_port),
+        "--workers", str(args.workers), "--log-level", "warning"
+    ], cwd=backend_dir, env=env)
+    processes.append(app)
+    wait_for(f"http://127.0.0.1:{args.app_port}/openapi.json", args.startup_timeout, app)
+
+
+def print_report(results: Dict[str, Dict]):
+    header = f"{'scenario':<14}{'reqs':>6}{'conc':>6}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'rss peak MB':>13}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        rss = result["rss_peak_mb"] if result["rss_peak_mb"] is not None else "-"
+        print(
+            f"{name:<14}{result['requests']:>6}{result['concurrency']:>6}{result['errors']:>6}"
+            f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            f"{result['throughput_rps']:>9}{rss:>13}"
+        )
+
+
+async def run(args, app_url: str, app_pid: Optional[int]) -> Dict[str, Dict]:
+    sampler = RssSampler(app_pid)
+    timeout = httpx.Timeout(args.request_timeout)
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    results = {}
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        scenarios = Scenarios(client, args.unique_questions, args.startup_timeout)
+        for name in args.scenarios:
+            await scenarios.setup(name)
+            results[name] = await run_scenario(getattr(scenarios, name), args.requests, args.concurrency, sampler)
+            print(f"{name}: done in {results[name]['elapsed_s']}s", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--unique-questions", action="store_true", help="Make every question unique to bypass the answer cache")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--app-url", help="Use an already running app instead of starting one")
+    parser.add_argument("--app-pid", type=int, help="PID of the running app, for RSS sampling")
+    parser.add_argument("--app-port", type=int, default=8900)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started app")
+    parser.add_argument("--startup-timeout", type=float, default=600,
+                        help="Seconds to wait for the app to start and for scenario setup uploads to be indexed")
+    parser.add_argument("--llm-port", type=int, default=8901)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=250)
+    parser.add_argument("--llm-completion-tokens", type=int, default=200)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--search-backend", default="fake", choices=["fake", "none", "duckduckgo"],
+                        help="Web search provider of the started app (duckduckgo goes over the network)")
+    parser.add_argument("--search-latency-ms", type=float, default=200, help="Latency of the fake web search")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    processes = []
+    try:
+        if args.app_url:
+            app_url, app_pid = args.app_url, args.app_pid
+        else:
+            start_servers(args, processes)
+            app_url, app_pid = f"http://127.0.0.1:{args.app_port}", processes[-1].pid
+
+        results = asyncio.run(run(args, app_url, app_pid))
+        print()
+        print_report(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
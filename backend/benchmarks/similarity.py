@@ -0,0 +1,56 @@
+"""
+Micro-benchmark: pairwise EmbeddingsUtil.compute_similarity loop vs. top_k_similarities.
+
+Run from the backend directory:
+    python -m benchmarks.similarity --queries 20 --corpus 5000 --dim 384 --k 5
+"""
+import argparse
+import time
+import numpy as np
+
+from utils.embeddings import EmbeddingsUtil, normalize_rows, top_k_similarities
+
+
+def pairwise_top_k(util: EmbeddingsUtil, queries, corpus, k: int):
+    """Score every pair with compute_similarity and sort, as callers did before"""
+    results = []
+    for query in queries:
+        scores = [util.compute_similarity(query, doc) for doc in corpus]
+        results.append(sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--corpus", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    corpus = rng.standard_normal((args.corpus, args.dim)).astype(np.float32)
+
+    # compute_similarity does not touch the model, so skip loading it
+    util = EmbeddingsUtil.__new__(EmbeddingsUtil)
+
+    start = time.perf_counter()
+    expected = pairwise_top_k(util, queries.tolist(), corpus.tolist(), args.k)
+    pairwise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indices, _ = top_k_similarities(normalize_rows(queries), normalize_rows(corpus), args.k, args.chunk_size)
+    matrix_seconds = time.perf_counter() - start
+
+    matches = sum(list(row) == exp for row, exp in zip(indices.tolist(), expected))
+    print(f"queries={args.queries} corpus={args.corpus} dim={args.dim} k={args.k}")
+    print(f"pairwise loop:  {pairwise_seconds * 1000:10.1f} ms")
+    print(f"matrix top-k:   {matrix_seconds * 1000:10.1f} ms")
+    print(f"speedup:        {pairwise_seconds / matrix_seconds:10.1f}x")
+    print(f"identical top-k for {matches}/{args.queries} queries")
+
+
+if __name__ == "__main__":
+    main()
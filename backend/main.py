@@ -11,10 +11,11 @@ from services.document_service import session_manager, get_session_service, Docu
 from routes.documents_qa import router as document_qa_router, SessionMiddleware
 from routes.cover_letter import cover_letter_router
 from services.api_key_validation import get_groq_api_key
-from services.job_matching_service import JobMatchingService
 from routes import cv_analyzer
 from routes import chat_router
 from services.rag_service import RAGService
+from utils.embeddings import embeddings_registry
+from utils.uploads import UploadLimitMiddleware, extracted_text_cache
 
 # Configure logging
 logging.basicConfig(
@@ -77,6 +78,10 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan, title="Multi AI API")
 
+# Refuse oversized request bodies while they are still being received; registered
+# before CORS so CORS wraps it and its 413 responses carry the CORS headers
+app.add_middleware(UploadLimitMiddleware)
+
 # Add CORS middleware to allow your frontend to communicate with the API
 app.add_middleware(
     CORSMiddleware,
@@ -101,16 +106,30 @@ async def trigger_session_cleanup(background_tasks: BackgroundTasks):
         logger.error(f"Error triggering session cleanup: {str(e)}")
         return {"error": str(e)}
 
+@app.get("/api/admin/embedding-cache", include_in_schema=False)
+async def embedding_cache_stats():
+    """Embedding cache hit/miss counters (admin use only)"""
+    return {
+        "models": embeddings_registry.loaded_models(),
+        "caches": embeddings_registry.cache_stats(),
+        "batchers": embeddings_registry.batcher_stats(),
+        "extracted_text": extracted_text_cache.stats()
+    }
+
+@app.get("/api/admin/sessions", include_in_schema=False)
+async def session_stats():
+    """Document Q&A sessions and their memory use (admin use only)"""
+    return session_manager.debug_sessions()
+
 # Initialize services on startup
 @app.on_event("startup")
 async def startup_event():
-    # Initialize job matching service and preload embeddings
-    job_service = JobMatchingService()
-    await job_service.initialize_embeddings()
+    # Preload embeddings on the job matching service the CV analyzer routes use
+    await cv_analyzer.job_service.initialize_embeddings()
     
     # Create a global session for backward compatibility
     global_session_id = session_manager.create_session()
-    global_service = session_manager.get_session(global_session_id)["document_service"]
+    global_service = (await session_manager.get_session(global_session_id))["document_service"]
     
     # Register the global service for other routes to use
     from services.document_service import service_registry
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import os
+import json
+import asyncio
+import uuid
+import shutil
 import logging
 from services.rag_service import RAGService
+from services.ingestion_service import IngestionManager, resolve_ingest_directory
+from utils.uploads import spool_upload, UploadTooLarge
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +23,7 @@ router = APIRouter(
 
 # Create a global instance of the RAG service
 rag_service = RAGService()
+ingestion_manager = IngestionManager(rag_service)
 
 # Pydantic models for request and response validation
 class ChatRequest(BaseModel):
@@ -35,6 +42,8 @@ class DocumentResponse(BaseModel):
     success: bool
     message: str
     chunks: int = 0
+    duplicates: int = 0
+    job_id: Optional[str] = None
 
 def get_rag_service():
     """Dependency to get the RAG service instance"""
@@ -47,7 +56,7 @@ async def query_chatbot(request: ChatRequest, rag_service: RAGService = Depends(
     """
     try:
         # Generate response
-        response = rag_service.generate_response(request.message)
+        response = await rag_service.agenerate_response(request.message)
         
         return ChatResponse(
             answer=response["answer"],
@@ -58,44 +67,114 @@ async def query_chatbot(request: ChatRequest, rag_service: RAGService = Depends(
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
     
+@router.post("/query/stream")
+async def stream_chatbot(request: ChatRequest, rag_service: RAGService = Depends(get_rag_service)):
+    """
+    Query the chatbot and stream the answer as server-sent events.
+    
+    Sends a `token` event per generated chunk, an `error` event if generation
+    fails, and a final `done` event carrying `sources` and `search_results`.
+    """
+    async def event_stream():
+        try:
+            async for event in rag_service.astream_response(request.message):
+                event_type = event.pop("type")
+                yield f"event: {event_type}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'message': f'Error processing query: {str(e)}'})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _save_uploads(files: List[UploadFile]) -> List[str]:
+    """
+    Save uploaded files under uploads/ and return their paths
+
+    Each file gets a directory of its own, so uploads sharing a name keep
+    their basename without overwriting one another. The ingestion job that
+    receives the paths deletes them once they are read.
+    """
+    file_paths = []
+    for file in files:
+        upload_dir = os.path.join("uploads", f"ingest-{uuid.uuid4().hex}")
+        os.makedirs(upload_dir, exist_ok=True)
+        file_path = os.path.join(upload_dir, os.path.basename(file.filename or "upload.txt"))
+        try:
+            await spool_upload(file, destination=file_path)
+        except UploadTooLarge as e:
+            for path in file_paths + [file_path]:
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            raise HTTPException(status_code=413, detail=str(e))
+        file_paths.append(file_path)
+    return file_paths
+
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     rag_service: RAGService = Depends(get_rag_service)
 ):
     """
     Upload a document to the RAG system
+    
+    The document is processed by an ingestion job; poll /ingest/{job_id} for progress.
     """
     try:
-        # Create uploads directory if it doesn't exist
-        os.makedirs("uploads", exist_ok=True)
-        
-        # Save the file
-        file_path = f"uploads/{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Process the document in the background
-        def process_doc():
-            try:
-                docs = rag_service.load_documents([file_path])
-                rag_service.process_documents(docs)
-                logger.info(f"Successfully processed document {file.filename}")
-            except Exception as e:
-                logger.error(f"Error processing document: {str(e)}")
-        
-        background_tasks.add_task(process_doc)
+        file_paths = await _save_uploads([file])
+        job = ingestion_manager.submit(file_paths, spooled=file_paths)
         
         return DocumentResponse(
             success=True,
             message=f"Document {file.filename} uploaded and queued for processing",
+            job_id=job.job_id
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading document: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error uploading document: {str(e)}")
 
+@router.post("/ingest", status_code=202)
+async def bulk_ingest(
+    files: Optional[List[UploadFile]] = File(None),
+    directory: Optional[str] = Form(None, description="Server-side directory inside INGEST_ALLOWED_DIRS")
+):
+    """
+    Start a bulk ingestion job for many uploaded files and/or a server-side directory
+    
+    Returns the job status immediately; poll /ingest/{job_id} for per-file progress.
+    """
+    file_paths = []
+    if directory:
+        try:
+            file_paths.extend(resolve_ingest_directory(directory))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    spooled = await _save_uploads(files) if files else []
+    file_paths.extend(spooled)
+    if not file_paths:
+        raise HTTPException(status_code=400, detail="No files to ingest")
+    
+    try:
+        job = ingestion_manager.submit(file_paths, spooled=spooled)
+    except Exception as e:
+        logger.error(f"Error starting ingestion job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error starting ingestion job: {str(e)}")
+    return job.to_dict()
+
+@router.get("/ingest/{job_id}")
+async def get_ingestion_status(job_id: str):
+    """
+    Get per-file progress and throughput of an ingestion job
+    """
+    job = ingestion_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    return job.to_dict()
+
 @router.post("/text", response_model=DocumentResponse)
 async def add_document_text(
     request: DocumentTextRequest,
@@ -105,14 +184,26 @@ async def add_document_text(
     Add document text directly to the RAG system
     """
     try:
-        # Add the text as a document
-        chunks = rag_service.add_document_from_text(request.text, request.source)
+        # Add the text as a document, skipping chunks that are already indexed;
+        # embedding and the commit block, so keep them off the event loop
+        report = await asyncio.to_thread(rag_service.add_document_from_text, request.text, request.source)
         
         return DocumentResponse(
             success=True,
             message=f"Text added successfully as document from source '{request.source}'",
-            chunks=chunks
+            chunks=report["added"],
+            duplicates=report["duplicates"]
         )
     except Exception as e:
         logger.error(f"Error adding document text: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error adding document text: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error adding document text: {str(e)}")
+
+@router.get("/cache-stats")
+async def get_cache_stats(rag_service: RAGService = Depends(get_rag_service)):
+    """
+    Get hit/miss metrics for the chatbot's caches
+    """
+    return {
+        "search": rag_service.search_cache.stats(),
+        "answers": rag_service.answer_cache.stats()
+    }
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, Form, UploadFile, File, Depends
 from typing import Optional
+import os
 from pydantic import BaseModel
 
 from services.cover_letter_service import generate_cover_letter_from_cv_file
 from services.api_key_validation import get_groq_api_key
+from utils.uploads import spool_upload, UploadTooLarge
 
 cover_letter_router = APIRouter(tags=["Cover Letter"])
 
@@ -34,10 +36,14 @@ async def create_cover_letter(
             detail=f"Unsupported file format: {file_extension}. Please upload a PDF or Word document."
         )
     
+    try:
+        upload = await spool_upload(cv_file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
     try:
         cover_letter, extracted_info, cv_text = await generate_cover_letter_from_cv_file(
-            cv_file.file,
-            cv_file.filename,
+            upload,
             applying_role,
             company_name,
             tone,
@@ -50,4 +56,6 @@ async def create_cover_letter(
             cv_text=cv_text
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate cover letter: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate cover letter: {str(e)}")
+    finally:
+        os.unlink(upload.path)
\ No newline at end of file
@@ -3,6 +3,7 @@ from typing import List, Optional
 from services.cv_service import CVService
 from services.job_matching_service import JobMatchingService
 from models.schemas import CVAnalysisResponse, JobMatchResponse
+from utils.uploads import UploadTooLarge
 
 # Import the scraper setup function
 from services.job_scrap import setup_scraper_in_main_app
@@ -38,6 +39,8 @@ async def analyze_cv(
             "recommendations": recommendations,
             "matching_jobs": matching_jobs
         }
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing CV: {str(e)}")
 
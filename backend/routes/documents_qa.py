@@ -3,9 +3,13 @@ from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, s
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from typing import List, Optional, Tuple
+import os
 import logging
 
 from services.document_service import get_session_service, DocumentQAService, session_manager, service_registry
+from services.document_ingestion import document_ingestion_queue, IngestionQueueFull
+from services.ingestion_service import INDEXED, FAILED
+from utils.uploads import spool_upload, UploadTooLarge
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -66,7 +70,8 @@ async def upload_documents(
     
     - **files**: List of files to upload (PDF, DOCX, DOC, PPTX, PPT)
     
-    Returns a list of processing results for each file.
+    Files are indexed in the background. Returns 202 with a job ID per file;
+    poll /status for their progress.
     """
     if not files:
         raise HTTPException(
@@ -75,6 +80,7 @@ async def upload_documents(
         )
         
     results = []
+    accepted = []  # (spooled upload, result) of the files to queue
     allowed_extensions = ['.pdf', '.docx', '.doc', '.pptx', '.ppt']
     
     for file in files:
@@ -101,10 +107,11 @@ async def upload_documents(
                 })
                 continue
                 
-            # Read file content
-            file_content = await file.read()
+            # Stream the file to disk, enforcing the size limit as it arrives
+            upload = await spool_upload(file)
             
-            if not file_content:
+            if not upload.size:
+                os.unlink(upload.path)
                 logger.warning(f"Empty file: {filename}")
                 results.append({
                     "filename": filename,
@@ -112,18 +119,30 @@ async def upload_documents(
                     "message": "File is empty"
                 })
                 continue
-                
-            # Process the file
-            logger.info(f"Processing file: {filename}")
-            success = await service.process_file(file_content, filename)
             
-            # Add debug info to verify documents are being processed
-            logger.info(f"File processed: {filename}, Success: {success}, Document count: {service.get_document_count()}")
+            # Skip files already indexed in this session or repeated in this upload
+            if upload.sha256 in service.file_hashes or any(upload.sha256 == other.sha256 for other, _ in accepted):
+                os.unlink(upload.path)
+                logger.info(f"Skipping duplicate file: {filename}")
+                results.append({
+                    "filename": filename,
+                    "success": True,
+                    "duplicate": True,
+                    "message": "File has already been uploaded to this session"
+                })
+                continue
+                
+            # Queued below with the rest of the upload
+            result = {"filename": filename, "success": False}
+            results.append(result)
+            accepted.append((upload, result))
             
+        except UploadTooLarge as e:
+            logger.warning(f"Rejected oversized file {filename}: {str(e)}")
             results.append({
                 "filename": filename,
-                "success": success,
-                "message": "File processed successfully" if success else "Failed to process file"
+                "success": False,
+                "message": str(e)
             })
             
         except Exception as e:
@@ -134,7 +153,25 @@ async def upload_documents(
                 "message": f"Error processing file: {str(e)}"
             })
     
-    response_status = status.HTTP_207_MULTI_STATUS if any(not r["success"] for r in results) else status.HTTP_200_OK
+    # Queue the valid files together: they are parsed in parallel and indexed in
+    # one batch in the background
+    if accepted:
+        try:
+            jobs = await document_ingestion_queue.submit(service, [upload for upload, _ in accepted])
+            for (_, result), job in zip(accepted, jobs):
+                result.update({
+                    "success": True,
+                    "job_id": job.job_id,
+                    "status": job.status,
+                    "message": "File queued for processing"
+                })
+        except IngestionQueueFull as e:
+            logger.warning(f"Ingestion queue full, rejecting {len(accepted)} files: {str(e)}")
+            for upload, result in accepted:
+                os.unlink(upload.path)
+                result["message"] = "Too many files are being processed, please retry shortly"
+    
+    response_status = status.HTTP_207_MULTI_STATUS if any(not r["success"] for r in results) else status.HTTP_202_ACCEPTED
     
     # Debug info in response
     document_count = service.get_document_count()
@@ -180,7 +217,7 @@ async def ask_question(
         # Get the document service based on the session token
         if session_token:
             # First try to get from session manager
-            session = session_manager.get_session(session_token)
+            session = await session_manager.get_session(session_token)
             if session:
                 service = session["document_service"]
                 logger.info(f"Found service for session: {session_token}")
@@ -196,10 +233,13 @@ async def ask_question(
         if not service:
             logger.warning("No document service found, creating new session")
             session_token = session_manager.create_session()
-            session = session_manager.get_session(session_token)
+            session = await session_manager.get_session(session_token)
             service = session["document_service"]
             request.state.session_token = session_token  # Set for middleware to handle
         
+        # Reload the index if it was spilled to disk under memory pressure
+        await session_manager.ensure_resident(service)
+        
         # Validate inputs
         if not question.strip():
             raise HTTPException(
@@ -270,23 +310,37 @@ async def get_status(
     """
     Check the status of the document service for the current session.
     
-    Returns information about whether documents have been uploaded and indexed.
+    Returns information about whether documents have been uploaded and indexed,
+    and the state (queued, parsing, embedding, indexed or failed) of each uploaded file.
     """
     try:
         has_documents = service.vector_store is not None
         document_count = service.get_document_count()
+        jobs = await document_ingestion_queue.jobs(service.session_id)
+        pending_files = sum(1 for job in jobs if job["status"] not in (INDEXED, FAILED))
         
         logger.info(f"Status check for session token: {request.state.session_token}")
-        logger.info(f"Has documents: {has_documents}, Document count: {document_count}")
+        logger.info(f"Has documents: {has_documents}, Document count: {document_count}, Pending files: {pending_files}")
+        
+        if pending_files:
+            status_name = "processing"
+            message = f"{pending_files} files are being processed; {document_count} documents are indexed"
+        elif has_documents:
+            status_name = "ready"
+            message = f"{document_count} documents are indexed and ready for queries"
+        else:
+            status_name = "no_documents"
+            message = "No documents have been uploaded yet"
         
         return {
-            "status": "ready" if has_documents else "no_documents",
+            "status": status_name,
             "has_documents": has_documents,
             "session_info": {
-                "document_count": document_count
+                "document_count": document_count,
+                "pending_files": pending_files
             },
-            "message": f"{document_count} documents are indexed and ready for queries" if has_documents 
-                      else "No documents have been uploaded yet"
+            "files": jobs,
+            "message": message
         }
         
     except Exception as e:
@@ -307,8 +361,9 @@ async def reset_session(
     Reset the current session by deleting all documents.
     """
     try:
-        # Actually perform the reset by cleaning up the service
-        service.cleanup()
+        # Actually perform the reset by cleaning up the service, for every worker
+        async with session_manager.write_session(service):
+            service.cleanup()
         
         # The middleware will handle sending the new session token
         return {
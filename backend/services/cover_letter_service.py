@@ -1,53 +1,17 @@
 import os
-import tempfile
-from langchain_groq import ChatGroq
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import StrOutputParser
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
 from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
 import json
-from typing import Optional, Tuple, Dict, BinaryIO
+from typing import Optional, Tuple, Dict
 
-async def parse_cv_file(file: BinaryIO, filename: str) -> str:
-    """
-    Parse CV file (PDF or DOCX) and extract text content
-    """
-    # Create a temporary file to save the uploaded content
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
-        temp_file.write(file.read())
-        temp_path = temp_file.name
-    
-    try:
-        # Process based on file extension
-        file_extension = os.path.splitext(filename)[1].lower()
-        
-        if file_extension == '.pdf':
-            # Use PyPDFLoader for PDF files
-            loader = PyPDFLoader(temp_path)
-            documents = loader.load()
-            text_content = ' '.join([doc.page_content for doc in documents])
-        elif file_extension in ['.docx', '.doc']:
-            # Use Docx2txtLoader for Word documents
-            loader = Docx2txtLoader(temp_path)
-            documents = loader.load()
-            text_content = ' '.join([doc.page_content for doc in documents])
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-        
-        return text_content
-    finally:
-        # Clean up the temporary file
-        os.unlink(temp_path)
+from utils.context_packing import pack_text, CONTEXT_BUDGET_CV, CONTEXT_BUDGET_COVER_LETTER
+from utils.llm_clients import get_llm
+from utils.uploads import SpooledUpload, extracted_text_cache
 
-async def extract_cv_information(cv_text: str, groq_api_key: str) -> Dict:
-    """
-    Extract relevant information from the provided CV text
-    """
-    llm = ChatGroq(
-        api_key=groq_api_key,
-        model_name="llama3-70b-8192",
-    )
-    
-    extraction_template = """
+EXTRACTION_TEMPLATE = """
     Extract the following information from the provided CV/resume. Return the information in a JSON format:
     
     CV Content:
@@ -63,54 +27,8 @@ async def extract_cv_information(cv_text: str, groq_api_key: str) -> Dict:
     
     Return ONLY valid JSON with no additional text or explanation.
     """
-    
-    extraction_prompt = ChatPromptTemplate.from_template(extraction_template)
-    extraction_chain = extraction_prompt | llm | StrOutputParser()
-    
-    # Extract information from the CV
-    result = await extraction_chain.ainvoke({"cv_text": cv_text})
-    
-    # Parse the JSON result
-    try:
-        extracted_info = json.loads(result)
-        return extracted_info
-    except json.JSONDecodeError:
-        # Fallback in case the LLM doesn't return valid JSON
-        return {
-            "name": "Unknown",
-            "current_role": "Unknown",
-            "years_experience": 0,
-            "key_skills": [],
-            "education": "Unknown",
-            "achievements": []
-        }
 
-async def generate_cover_letter_from_cv_file(
-    cv_file: BinaryIO,
-    filename: str,
-    applying_role: str,
-    company_name: str,
-    tone: str = "professional",
-    additional_instructions: Optional[str] = None, 
-    groq_api_key: str = os.getenv("GROQ_API_KEY")
-) -> Tuple[str, Dict]: 
-    """
-    Generate a personalized cover letter by processing a CV file and extracting information
-    """
-    # Parse the CV file to extract text
-    cv_text = await parse_cv_file(cv_file, filename)
-    
-    # Extract information from the CV text
-    extracted_info = await extract_cv_information(cv_text, groq_api_key)
-    
-    # Initialize Groq LLM
-    llm = ChatGroq(
-        api_key=groq_api_key,
-        model_name="llama3-70b-8192",
-    )
-    
-    # Create the prompt template
-    template = """
+COVER_LETTER_TEMPLATE = """
     You are a professional cover letter writer. Generate a personalized cover letter using the following information:
 
     Applicant Information:
@@ -143,11 +61,92 @@ async def generate_cover_letter_from_cv_file(
     
     Return only the formatted cover letter, ready to use.
     """
+
+EXTRACTION_PROMPT = ChatPromptTemplate.from_template(EXTRACTION_TEMPLATE)
+COVER_LETTER_PROMPT = ChatPromptTemplate.from_template(COVER_LETTER_TEMPLATE)
+
+# prompt | llm | parser chains, built once per prompt and shared LLM client
+_chains: Dict[Tuple[int, int], Runnable] = {}
+
+def _get_chain(prompt: ChatPromptTemplate, llm: BaseChatModel) -> Runnable:
+    key = (id(prompt), id(llm))
+    chain = _chains.get(key)
+    if chain is None:
+        chain = prompt | llm | StrOutputParser()
+        _chains[key] = chain
+    return chain
+
+async def parse_cv_file(cv_file: SpooledUpload) -> str:
+    """
+    Parse CV file (PDF or DOCX) and extract text content
+    """
+    # Re-uploads of the same CV reuse the text extracted the first time
+    text_content = extracted_text_cache.get("cover_letter", cv_file.sha256)
+    if text_content is not None:
+        return text_content
     
-    prompt = ChatPromptTemplate.from_template(template)
+    # Process based on file extension
+    file_extension = os.path.splitext(cv_file.filename)[1].lower()
+    
+    if file_extension == '.pdf':
+        # Use PyPDFLoader for PDF files
+        loader = PyPDFLoader(cv_file.path)
+        documents = loader.load()
+        text_content = ' '.join([doc.page_content for doc in documents])
+    elif file_extension in ['.docx', '.doc']:
+        # Use Docx2txtLoader for Word documents
+        loader = Docx2txtLoader(cv_file.path)
+        documents = loader.load()
+        text_content = ' '.join([doc.page_content for doc in documents])
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+    
+    extracted_text_cache.put("cover_letter", cv_file.sha256, text_content)
+    return text_content
+
+async def extract_cv_information(cv_text: str, groq_api_key: str) -> Dict:
+    """
+    Extract relevant information from the provided CV text
+    """
+    extraction_chain = _get_chain(EXTRACTION_PROMPT, get_llm(groq_api_key))
+    
+    # Extract information from the CV
+    result = await extraction_chain.ainvoke({"cv_text": pack_text(cv_text, CONTEXT_BUDGET_CV)})
+    
+    # Parse the JSON result
+    try:
+        extracted_info = json.loads(result)
+        return extracted_info
+    except json.JSONDecodeError:
+        # Fallback in case the LLM doesn't return valid JSON
+        return {
+            "name": "Unknown",
+            "current_role": "Unknown",
+            "years_experience": 0,
+            "key_skills": [],
+            "education": "Unknown",
+            "achievements": []
+        }
+
+async def generate_cover_letter_from_cv_file(
+    cv_file: SpooledUpload,
+    applying_role: str,
+    company_name: str,
+    tone: str = "professional",
+    additional_instructions: Optional[str] = None, 
+    groq_api_key: str = os.getenv("GROQ_API_KEY")
+) -> Tuple[str, Dict]: 
+    """
+    Generate a personalized cover letter by processing a CV file and extracting information
+    """
+    # Parse the CV file to extract text
+    cv_text = await parse_cv_file(cv_file)
+    
+    # Extract information from the CV text
+    extracted_info = await extract_cv_information(cv_text, groq_api_key)
     
-    # Create the chain
-    chain = prompt | llm | StrOutputParser()
+    # Shared client and prebuilt chain
+    chain = _get_chain(COVER_LETTER_PROMPT, get_llm(groq_api_key))
     
     # Generate the cover letter
     cover_letter = await chain.ainvoke({
@@ -159,7 +158,8 @@ async def generate_cover_letter_from_cv_file(
         "achievements": ", ".join(extracted_info.get("achievements", [])),
         "applying_role": applying_role,
         "company_name": company_name,
-        "cv_text": cv_text,
+        # The extracted fields carry the essentials; the raw CV is only extra context
+        "cv_text": pack_text(cv_text, CONTEXT_BUDGET_COVER_LETTER),
         "tone": tone,
         "additional_instructions": additional_instructions if additional_instructions else "None"
     })
@@ -2,13 +2,15 @@ import os
 import re
 from typing import Dict, List, Tuple, Any
 from fastapi import UploadFile
-import tempfile
 import docx2txt
 from pypdf import PdfReader
-from langchain_groq import ChatGroq
 from langchain.schema import HumanMessage
 from dotenv import load_dotenv
 
+from utils.context_packing import pack_text, CONTEXT_BUDGET_CV
+from utils.llm_clients import get_llm
+from utils.uploads import spool_upload, extracted_text_cache
+
 load_dotenv()
 
 class CVService:
@@ -18,10 +20,8 @@ class CVService:
         if not api_key:
             raise ValueError("GROQ_API_KEY is not set in environment variables")
         
-        self.llm = ChatGroq(
-            api_key=api_key,
-            model_name="llama3-70b-8192"
-        )
+        # Shared client, so CV analysis reuses pooled Groq connections
+        self.llm = get_llm(api_key)
     
     async def extract_cv_info(self, file: UploadFile) -> Tuple[str, Dict[str, Any]]:
         """
@@ -38,26 +38,28 @@ class CVService:
     
     async def _extract_text(self, file: UploadFile) -> str:
         """Extract text from CV file (PDF or DOCX)."""
-        file_content = await file.read()
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
+        upload = await spool_upload(file)
         
         try:
-            temp_file.write(file_content)
-            temp_file.close()
+            # The same CV is often analyzed repeatedly; skip parsing it again
+            text = extracted_text_cache.get("cv_service", upload.sha256)
+            if text is not None:
+                return text
             
             # Process based on file extension
-            file_ext = file.filename.split('.')[-1].lower()
+            file_ext = upload.filename.split('.')[-1].lower()
             
             if file_ext == 'pdf':
-                text = self._extract_from_pdf(temp_file.name)
+                text = self._extract_from_pdf(upload.path)
             elif file_ext in ['docx', 'doc']:
-                text = self._extract_from_docx(temp_file.name)
+                text = self._extract_from_docx(upload.path)
             else:
                 raise ValueError(f"Unsupported file format: {file_ext}")
                 
+            extracted_text_cache.put("cv_service", upload.sha256, text)
             return text
         finally:
-            os.unlink(temp_file.name)
+            os.unlink(upload.path)
     
     def _extract_from_pdf(self, file_path: str) -> str:
         """Extract text from PDF file."""
@@ -76,6 +78,7 @@ class CVService:
         Use LLM to extract structured data from CV text.
         Returns dictionary with name, email, phone, skills, education, experience, etc.
         """
+        cv_text = pack_text(cv_text, CONTEXT_BUDGET_CV)
         prompt = f"""
         Extract the following information from the CV text below and return it in a structured JSON format:
         - name: The candidate's full name
@@ -132,6 +135,7 @@ class CVService:
         """
         Generate recommendations and remarks based on the CV content.
         """
+        cv_text = pack_text(cv_text, CONTEXT_BUDGET_CV)
         prompt = f"""
         Analyze the following CV and provide:
         1. Strengths: List the strongest aspects of this CV
@@ -0,0 +1,212 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+from langchain_core.documents import Document
+
+from services.document_service import DocumentQAService, SessionManager, session_manager
+from services.ingestion_service import QUEUED, PARSING, EMBEDDING, INDEXED, FAILED
+from utils.document_parsing import load_and_split
+from utils.uploads import SpooledUpload
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Threads embedding uploaded documents
+DOCUMENT_INGEST_WORKERS = int(os.getenv("DOCUMENT_INGEST_WORKERS", "2"))
+# Processes parsing and splitting uploaded files in parallel (0 parses on the embedding threads)
+DOCUMENT_PARSE_PROCESSES = int(os.getenv("DOCUMENT_PARSE_PROCESSES", str(os.cpu_count() or 1)))
+# Files waiting or in progress before uploads are refused
+DOCUMENT_INGEST_MAX_PENDING = int(os.getenv("DOCUMENT_INGEST_MAX_PENDING", "100"))
+
+
+class IngestionQueueFull(Exception):
+    """Raised when an upload would exceed DOCUMENT_INGEST_MAX_PENDING"""
+
+
+class DocumentJob:
+    """Progress of one uploaded file"""
+
+    def __init__(self, session_id: str, filename: str):
+        self.job_id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.filename = filename
+        self.status = QUEUED
+        self.chunks = 0
+        self.added = 0
+        self.duplicates = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "chunks": self.chunks,
+            "added": self.added,
+            "duplicates": self.duplicates,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class DocumentIngestionQueue:
+    """
+    Indexes /upload-qa files in the background.
+
+    The files of one upload are parsed and split in parallel on a process pool,
+    so PDF extraction scales with cores instead of sharing the GIL. Their chunks
+    are then embedded as one batch on a thread and added to the session in a
+    single commit on the event loop, under the session's write lock, so they land
+    on its latest version and are published to every worker once. Job states are
+    kept in the session backend for status polling.
+    """
+
+    def __init__(
+        self,
+        manager: SessionManager,
+        workers: int = DOCUMENT_INGEST_WORKERS,
+        parse_processes: int = DOCUMENT_PARSE_PROCESSES,
+        max_pending: int = DOCUMENT_INGEST_MAX_PENDING
+    ):
+        self.session_manager = manager
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="document-ingest")
+        # Spawned rather than forked: the server process runs threads (event loop, torch, FAISS)
+        self.parse_executor: Executor = (
+            ProcessPoolExecutor(max_workers=parse_processes, mp_context=multiprocessing.get_context("spawn"))
+            if parse_processes > 0 else self.executor
+        )
+        self.pending = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, service: DocumentQAService, files: List[SpooledUpload]) -> List[DocumentJob]:
+        """
+        Queue the files of one upload for indexing into a session
+
+        Args:
+            service: Document service of the session
+            files: Uploads spooled to disk; the queue deletes them when done
+
+        Returns:
+            One queued job per file, in order
+
+        Raises:
+            IngestionQueueFull: If the files would exceed the pending limit
+        """
+        if self.pending + len(files) > self.max_pending:
+            raise IngestionQueueFull(f"{self.pending} files are already waiting to be processed")
+
+        batch = [(DocumentJob(service.session_id, upload.filename), upload) for upload in files]
+        self.pending += len(batch)
+        try:
+            for job, _ in batch:
+                await self._save(job)
+        except Exception:
+            self.pending -= len(batch)
+            raise
+        task = asyncio.create_task(self._run(service, batch))
+        # Keep a reference so the task is not garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f"Queued {len(batch)} files for session {service.session_id}")
+        return [job for job, _ in batch]
+
+    async def jobs(self, session_id: str) -> List[Dict[str, Any]]:
+        """Recent upload jobs of a session, oldest first"""
+        return await asyncio.to_thread(self.session_manager.backend.jobs, session_id)
+
+    async def _save(self, job: DocumentJob):
+        # A shared backend writes to SQLite, which may wait on other workers' writes
+        await asyncio.to_thread(self.session_manager.backend.save_job, job.session_id, job.to_dict())
+
+    async def _fail(self, job: DocumentJob, error: str):
+        logger.error(f"Error indexing {job.filename} for session {job.session_id}: {error}")
+        job.status = FAILED
+        job.error = error
+        job.finished_at = time.time()
+        await self._save(job)
+
+    async def _parse(self, job: DocumentJob, upload: SpooledUpload) -> List[Document]:
+        """Load and split one file on the parse pool; failures are recorded on the job"""
+        loop = asyncio.get_running_loop()
+        job.status = PARSING
+        job.started_at = time.time()
+        await self._save(job)
+        try:
+            splits = await loop.run_in_executor(self.parse_executor, load_and_split, upload.path, job.filename, job.session_id)
+        except Exception as e:
+            await self._fail(job, str(e))
+            return []
+        if not splits:
+            await self._fail(job, "No text could be extracted from the file")
+            return []
+        for split in splits:
+            split.metadata["file_sha256"] = upload.sha256
+        job.status = EMBEDDING
+        job.chunks = len(splits)
+        await self._save(job)
+        return splits
+
+    async def _run(self, service: DocumentQAService, batch: List[Tuple[DocumentJob, SpooledUpload]]):
+        loop = asyncio.get_running_loop()
+        jobs = [job for job, _ in batch]
+        try:
+            parsed = await asyncio.gather(*(self._parse(job, upload) for job, upload in batch))
+            indexable = [(job, splits) for job, splits in zip(jobs, parsed) if splits]
+            if not indexable:
+                return
+
+            # One embedding batch for every file of the upload, remembering each chunk's file
+            splits = [split for _, file_splits in indexable for split in file_splits]
+            owners = [position for position, (_, file_splits) in enumerate(indexable) for _ in file_splits]
+            keep = service.chunk_hashes.filter_texts([split.page_content for split in splits])
+            vectors = await loop.run_in_executor(
+                self.executor, service.embeddings.embed_documents, [splits[i].page_content for i in keep]
+            ) if keep else []
+
+            # The session may have been evicted or updated by another worker meanwhile
+            session = await self.session_manager.get_session(service.session_id)
+            if session is None:
+                raise ValueError("The session expired before the files were indexed")
+            target = session["document_service"]
+            async with self.session_manager.write_session(target):
+                report, added = target.add_embedded_splits([splits[i] for i in keep], vectors, len(splits) - len(keep))
+                added_per_file = [0] * len(indexable)
+                for position in added:
+                    added_per_file[owners[keep[position]]] += 1
+                target.document_count += sum(1 for count in added_per_file if count)
+            await self.session_manager.enforce_memory_budget(keep=service.session_id)
+
+            for (job, file_splits), count in zip(indexable, added_per_file):
+                job.added = count
+                job.duplicates = len(file_splits) - count
+                job.status = INDEXED
+                job.finished_at = time.time()
+                await self._save(job)
+            logger.info(f"Indexed {len(indexable)} files for session {service.session_id}: {report}")
+        except Exception as e:
+            for job in jobs:
+                if job.status not in (INDEXED, FAILED):
+                    await self._fail(job, str(e))
+        finally:
+            self.pending -= len(batch)
+            for _, upload in batch:
+                try:
+                    os.unlink(upload.path)
+                except OSError:
+                    pass
+
+
+# Global queue for document QA uploads
+document_ingestion_queue = DocumentIngestionQueue(session_manager)
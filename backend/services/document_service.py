@@ -1,25 +1,34 @@
 # Improved document_service.py with better debugging and session handling
 import os
+import shutil
 import tempfile
-from typing import Dict, List, Optional
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 import logging
 import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import APIKeyHeader
 from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    Docx2txtLoader,
-    UnstructuredPowerPointLoader
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_groq import ChatGroq
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_core.embeddings import Embeddings
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.language_models import BaseChatModel
+
+from utils.embeddings import get_embeddings
+from utils.faiss_index_manager import maybe_upgrade_index
+from utils.lexical_index import BM25Index, hybrid_search, ahybrid_search
+from utils.chunk_dedup import ChunkHashIndex
+from utils.context_packing import pack_context, CONTEXT_BUDGET_DOCUMENT_QA
+from utils.answer_cache import SemanticAnswerCache, ANSWER_CACHE_ENABLED, ANSWER_CACHE_SESSION_MAX_ENTRIES
+from utils.llm_clients import get_llm
+from utils.faiss_storage import save_faiss_store, load_faiss_store
+from utils.session_backend import SessionBackend, create_session_backend
+from utils.document_parsing import load_and_split
 
 class ServiceRegistry:
     """Registry for sharing services across the application"""
@@ -49,187 +58,591 @@ logger = logging.getLogger(__name__)
 # Header for session token
 SESSION_TOKEN_HEADER = APIKeyHeader(name="X-Session-Token", auto_error=False)
 
+# Memory budget for the indexes of all sessions in this process. Past it, the least
+# recently used sessions are written to SESSION_SPILL_DIR and reloaded on next use.
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "512"))
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", os.path.join(tempfile.gettempdir(), "document_qa_sessions"))
+# Shared session records are touched at most this often, sparing the backend a write per request
+SESSION_TOUCH_INTERVAL_SECONDS = float(os.getenv("SESSION_TOUCH_INTERVAL_SECONDS", "60"))
+
+# Kept verbatim (indentation included) from when it was built inside query_documents
+DOCUMENT_QA_TEMPLATE = """You are a helpful assistant that answers questions based on provided documents.
+            Answer the question based only on the following context:
+            {context}
+            
+            Question: {question}
+            
+            If the answer is not in the context, say "I don't have enough information to answer this question."
+            """
+
+DOCUMENT_QA_PROMPT = ChatPromptTemplate.from_template(DOCUMENT_QA_TEMPLATE)
+
+# Answer chains shared by every session, one per shared LLM client
+_document_qa_chains: Dict[int, Runnable] = {}
+
+def get_document_qa_chain(llm: BaseChatModel) -> Runnable:
+    """
+    Retrieval QA chain built once and shared by every session.
+    
+    The retriever is a runtime input: invoke with {"question", "k", "retriever"},
+    where retriever is a runnable mapping those inputs to the prompt context.
+    """
+    key = id(llm)
+    chain = _document_qa_chains.get(key)
+    if chain is None:
+        chain = (
+            {
+                "context": RunnableLambda(
+                    lambda inputs: inputs["retriever"].invoke(inputs),
+                    afunc=lambda inputs: inputs["retriever"].ainvoke(inputs)
+                ),
+                "question": RunnableLambda(lambda inputs: inputs["question"])
+            }
+            | DOCUMENT_QA_PROMPT
+            | llm
+            | StrOutputParser()
+        )
+        _document_qa_chains[key] = chain
+    return chain
+
+
+async def acquire_lock(lock):
+    """
+    Acquire a blocking lock (acquire()/release()) on a worker thread
+    
+    If the awaiting task is cancelled, the thread still gets the lock eventually;
+    it is then released at once rather than left held by nobody.
+    """
+    acquiring = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        def release(future: asyncio.Future):
+            if not future.cancelled() and future.exception() is None:
+                lock.release()
+        acquiring.add_done_callback(release)
+        raise
+
+
 class SessionManager:
-    """Manages user sessions and their document stores"""
+    """
+    Manages user sessions and their document stores
     
-    def __init__(self, session_expiry_hours=24):
+    Sessions are recorded in a SessionBackend. self.sessions is this worker's hot
+    cache of the sessions it has served, each tagged with the backend version its
+    index was loaded at; a newer version published by another worker is reloaded
+    on next access.
+    """
+    
+    def __init__(
+        self,
+        session_expiry_hours=24,
+        memory_budget_mb=SESSION_MEMORY_BUDGET_MB,
+        spill_dir=SESSION_SPILL_DIR,
+        backend: Optional[SessionBackend] = None
+    ):
         self.sessions = {}  # Dict mapping session_id to SessionData
         self.session_expiry_hours = session_expiry_hours
-        logger.info("Session manager initialized")
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.spill_dir = spill_dir
+        self.backend = backend or create_session_backend()
+        logger.info(f"Session manager initialized with {type(self.backend).__name__}")
     
-    def create_session(self) -> str:
-        """Create a new session and return the session token"""
-        session_id = str(uuid.uuid4())
+    def _cache_session(self, session_id: str, meta: Dict) -> Dict:
+        """Add a session to this worker's hot cache"""
         document_service = DocumentQAService(session_id)
-        
-        self.sessions[session_id] = {
-            "created_at": datetime.now(),
-            "last_accessed": datetime.now(),
+        session = {
+            "created_at": meta["created_at"],
+            "last_accessed": meta["last_accessed"],
+            "version": 0,  # Backend version of the index this worker holds
+            "sync_lock": asyncio.Lock(),  # Serializes reloads of a newer version
             "document_service": document_service
         }
+        self.sessions[session_id] = session
         
         # Register this document service in the global registry
         service_registry.register_service(f"document_service_{session_id}", document_service)
+        return session
+    
+    async def _sync_session(self, session: Dict, meta: Dict):
+        """Load the backend's index if another worker published a newer version"""
+        if session["version"] >= meta["version"]:
+            return
+        async with session["sync_lock"]:
+            # A concurrent request may have loaded it while this one waited
+            if session["version"] >= meta["version"]:
+                return
+            service = session["document_service"]
+            path = self.backend.index_path(service.session_id, meta["version"])
+            if path is None:
+                service.cleanup()
+            else:
+                # Reading the index and rebuilding its lexical indexes is slow; keep it off the event loop
+                service.apply_snapshot(await asyncio.to_thread(service.read_snapshot, path))
+                service.index_version += 1
+            service.document_count = meta["document_count"]
+            session["version"] = meta["version"]
+        logger.info(f"Loaded version {meta['version']} of session {service.session_id}")
+    
+    def create_session(self) -> str:
+        """Create a new session and return the session token"""
+        session_id = str(uuid.uuid4())
+        now = datetime.now()
+        self.backend.create(session_id, now)
+        self._cache_session(session_id, {"created_at": now, "last_accessed": now})
         
         logger.info(f"New session created: {session_id}")
         return session_id
     
-    def get_session(self, session_id: str) -> Optional[Dict]:
+    async def get_session(self, session_id: str) -> Optional[Dict]:
         """Get a session by ID if it exists and is not expired"""
-        if session_id not in self.sessions:
+        # A shared backend reads SQLite, which may wait on other workers' writes
+        meta = await asyncio.to_thread(self.backend.get, session_id)
+        if meta is None:
             logger.warning(f"Session not found: {session_id}")
+            # Another worker may have deleted it
+            self._evict(session_id)
             return None
-            
-        session = self.sessions[session_id]
+        
+        session = self.sessions.get(session_id)
+        last_accessed = max(meta["last_accessed"], session["last_accessed"]) if session else meta["last_accessed"]
         
         # Check if session is expired
-        if (datetime.now() - session["last_accessed"]) > timedelta(hours=self.session_expiry_hours):
+        if (datetime.now() - last_accessed) > timedelta(hours=self.session_expiry_hours):
             logger.info(f"Session expired: {session_id}")
             self.delete_session(session_id)
             return None
-            
-        # Update last accessed time
-        session["last_accessed"] = datetime.now()
+        
+        if session is None:
+            session = self._cache_session(session_id, meta)
+        
+        # Update last accessed time; the shared record only needs minute precision
+        now = datetime.now()
+        session["last_accessed"] = now
+        if (now - meta["last_accessed"]).total_seconds() > SESSION_TOUCH_INTERVAL_SECONDS:
+            await asyncio.to_thread(self.backend.touch, session_id, now)
         logger.debug(f"Session accessed: {session_id}")
+        
+        await self._sync_session(session, meta)
+        await self.ensure_resident(session["document_service"])
         return session
     
+    @asynccontextmanager
+    async def write_session(self, service: "DocumentQAService"):
+        """
+        Hold a session's write lock while its index is changed, then publish the change
+        
+        The lock is shared by every worker of a shared backend, so concurrent uploads
+        to one session are applied one after the other on the latest version.
+        """
+        lock = self.backend.lock(service.session_id)
+        await acquire_lock(lock)
+        # Keeps the index from being spilled until the change is published
+        service.active_writes += 1
+        try:
+            session = self.sessions.get(service.session_id)
+            meta = await asyncio.to_thread(self.backend.get, service.session_id)
+            if session is not None and meta is not None:
+                await self._sync_session(session, meta)
+                await service.restore()
+            version = service.index_version
+            
+            yield service
+            
+            if session is not None and meta is not None and service.index_version != version:
+                # Writing the whole index is slow; the lock keeps other writers out meanwhile
+                session["version"] = await asyncio.to_thread(
+                    self.backend.save_index, service.session_id, service.vector_store, service.document_count
+                )
+        finally:
+            service.active_writes -= 1
+            lock.release()
+    
+    async def ensure_resident(self, service: "DocumentQAService"):
+        """Reload a spilled session's index, then spill others if that breaks the budget"""
+        await service.restore()
+        await self.enforce_memory_budget(keep=service.session_id)
+    
+    def resident_bytes(self) -> int:
+        """Estimated memory held by the indexes of all resident sessions"""
+        return sum(session["document_service"].resident_bytes for session in self.sessions.values())
+    
+    async def enforce_memory_budget(self, keep: Optional[str] = None):
+        """
+        Free least recently used sessions until resident indexes fit the budget
+        
+        With a shared backend a session is just dropped from the hot cache, since the
+        backend already holds its index; otherwise its index is spilled to disk on a
+        worker thread. Sessions being queried, written or spilled are left alone.
+        
+        Args:
+            keep: Session that must stay resident (the one serving the current request)
+        """
+        resident = self.resident_bytes()
+        if resident <= self.memory_budget_bytes:
+            return
+        
+        candidates = sorted(
+            (
+                (session["last_accessed"], sid, session["document_service"])
+                for sid, session in self.sessions.items()
+                if sid != keep
+                and session["document_service"].resident_bytes > 0
+                and not session["document_service"].in_use
+            ),
+            key=lambda candidate: candidate[0]
+        )
+        for _, sid, service in candidates:
+            if resident <= self.memory_budget_bytes:
+                break
+            freed = service.resident_bytes
+            if self.backend.shared:
+                self._evict(sid)
+                resident -= freed
+            elif await service.spill(os.path.join(self.spill_dir, sid)):
+                resident -= freed
+        
+        if resident > self.memory_budget_bytes:
+            logger.warning(f"Session indexes use {resident} bytes, over the {self.memory_budget_bytes}-byte budget, with nothing left to spill")
+    
+    def _evict(self, session_id: str):
+        """Drop a session from this worker's hot cache, leaving the backend untouched"""
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session["document_service"].cleanup()
+            logger.info(f"Evicted session {session_id} from the hot cache")
+    
     def delete_session(self, session_id: str) -> bool:
         """Delete a session by ID"""
-        if session_id in self.sessions:
+        cached = session_id in self.sessions
+        if cached:
             # Clean up any resources
             service = self.sessions[session_id]["document_service"]
             service.cleanup()
             
             # Remove the session
             del self.sessions[session_id]
+        
+        if cached or self.backend.get(session_id) is not None:
+            self.backend.delete(session_id)
             logger.info(f"Session deleted: {session_id}")
             return True
         return False
     
     def cleanup_expired_sessions(self):
         """Clean up expired sessions to free memory"""
-        current_time = datetime.now()
-        expired_sessions = []
-        
-        for session_id, session in self.sessions.items():
-            if (current_time - session["last_accessed"]) > timedelta(hours=self.session_expiry_hours):
-                expired_sessions.append(session_id)
+        cutoff = datetime.now() - timedelta(hours=self.session_expiry_hours)
+        expired_sessions = [
+            session_id for session_id in self.backend.expired(cutoff)
+            # This worker may have served it since the shared record was last touched
+            if session_id not in self.sessions or self.sessions[session_id]["last_accessed"] < cutoff
+        ]
         
         for session_id in expired_sessions:
             self.delete_session(session_id)
+        
+        # Drop cached sessions other workers have deleted
+        for session_id in list(self.sessions):
+            if self.backend.get(session_id) is None:
+                self._evict(session_id)
             
         if expired_sessions:
             logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
 
     def debug_sessions(self):
         """Return debug information about all sessions"""
+        services = [session["document_service"] for session in self.sessions.values()]
         return {
-            "session_count": len(self.sessions),
+            "backend": type(self.backend).__name__,
+            "session_count": self.backend.count(),
+            "cached_session_count": len(self.sessions),
+            "memory": {
+                "budget_bytes": self.memory_budget_bytes,
+                "resident_bytes": sum(service.resident_bytes for service in services),
+                "spilled_bytes": sum(service.spilled_bytes for service in services),
+                "resident_sessions": sum(1 for service in services if service.resident_bytes > 0),
+                "spilled_sessions": sum(1 for service in services if service.is_spilled)
+            },
             "sessions": [
                 {
                     "id": sid,
                     "created_at": session["created_at"].isoformat(),
                     "last_accessed": session["last_accessed"].isoformat(),
+                    "version": session["version"],
                     "document_count": session["document_service"].get_document_count(),
-                    "has_vector_store": session["document_service"].vector_store is not None
+                    "has_vector_store": session["document_service"].vector_store is not None,
+                    "spilled": session["document_service"].is_spilled,
+                    "resident_bytes": session["document_service"].resident_bytes,
+                    "spilled_bytes": session["document_service"].spilled_bytes,
+                    "answer_cache": session["document_service"].answer_cache.stats()
                 }
                 for sid, session in self.sessions.items()
             ]
         }
 
 
+class SessionSnapshot(NamedTuple):
+    """A session index read from disk, with the indexes rebuilt over it"""
+    vector_store: FAISS
+    lexical_index: BM25Index
+    chunk_hashes: ChunkHashIndex
+    file_hashes: Set[str]
+    # Total length of the chunk texts
+    text_bytes: int
+
+
 class DocumentQAService:
     def __init__(self, session_id: str):
         self.session_id = session_id
         self.groq_api_key = os.getenv("GROQ_API_KEY")
         self.vector_store = None
+        self.lexical_index = BM25Index()
+        self.chunk_hashes = ChunkHashIndex()
+        self.last_dedup_report = None
+        self.index_version = 0  # Bumped whenever the store changes, invalidating cached answers
+        self.answer_cache = SemanticAnswerCache(max_entries=ANSWER_CACHE_SESSION_MAX_ENTRIES)
         self.embeddings = self._get_embeddings()
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         self.temp_files = []  # Track temporary files for cleanup
+        self.file_hashes = set()  # SHA-256 of the files indexed into this session
         self.document_count = 0  # Keep explicit count of documents
+        self.resident_bytes = 0  # Estimated memory held by the index, 0 while spilled
+        self.text_bytes = 0  # Total length of the indexed chunk texts
+        self.spilled_bytes = 0  # Size on disk while spilled
+        self.spill_path = None  # Directory holding the index while spilled
+        self.active_queries = 0  # Queries in flight; a session is never spilled under them
+        self.active_writes = 0  # Index changes in flight; likewise never spilled under them
+        self.index_lock = asyncio.Lock()  # Held while the index is spilled or restored off the event loop
+        # Hybrid (dense + BM25) retriever handed to the shared QA chain
+        self.retriever = RunnableLambda(self._retrieve_context, afunc=self._aretrieve_context)
         logger.info(f"Document QA Service initialized for session: {session_id}")
         
     def _get_embeddings(self) -> Embeddings:
-        """Initialize the embedding model"""
-        return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        """Get the shared embedding model"""
+        return get_embeddings("sentence-transformers/all-MiniLM-L6-v2")
     
     def _get_llm(self):
-        """Initialize the Groq LLM"""
+        """Get the shared Groq LLM client"""
         if not self.groq_api_key:
             logger.warning("GROQ_API_KEY not set, this will cause errors when querying documents")
             
-        return ChatGroq(
-            api_key=self.groq_api_key,
-            model_name="llama3-70b-8192",
-            temperature=0.2
+        return get_llm(self.groq_api_key, temperature=0.2)
+    
+    @property
+    def is_spilled(self) -> bool:
+        return self.spill_path is not None
+    
+    def _update_resident_bytes(self):
+        """Estimate the memory held by the vector store and the indexes built over it"""
+        if self.vector_store is None:
+            self.resident_bytes = 0
+            return
+        index = self.vector_store.index
+        try:
+            code_size = index.sa_code_size()
+        except RuntimeError:
+            code_size = index.d * 4
+        # Chunk texts live in the docstore and again, tokenized, in the BM25 index
+        self.resident_bytes = index.ntotal * code_size + 2 * self.text_bytes
+    
+    @property
+    def in_use(self) -> bool:
+        return bool(self.active_queries or self.active_writes or self.index_lock.locked())
+    
+    def _write_spill(self, vector_store: FAISS, path: str) -> int:
+        """Write a store to path (replaced if it exists) and return its size on disk"""
+        shutil.rmtree(path, ignore_errors=True)
+        save_faiss_store(vector_store, path)
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    
+    async def spill(self, path: str) -> bool:
+        """
+        Write the index to disk and drop it from memory
+        
+        The index is written on a worker thread. If the session is queried or
+        changed meanwhile, the copy on disk is discarded and the index stays resident.
+        
+        Args:
+            path: Directory to write (replaced if it exists)
+        
+        Returns:
+            True if the index was spilled
+        """
+        if self.vector_store is None or self.in_use:
+            return False
+        async with self.index_lock:
+            version = self.index_version
+            try:
+                spilled_bytes = await asyncio.to_thread(self._write_spill, self.vector_store, path)
+            except Exception as e:
+                logger.error(f"Error spilling session {self.session_id} to {path}: {str(e)}")
+                await asyncio.to_thread(shutil.rmtree, path, True)
+                return False
+            if self.active_queries or self.active_writes or self.index_version != version:
+                await asyncio.to_thread(shutil.rmtree, path, True)
+                return False
+            
+            self.spill_path = path
+            self.spilled_bytes = spilled_bytes
+            logger.info(f"Spilled session {self.session_id} ({self.resident_bytes} bytes in memory, {self.spilled_bytes} on disk)")
+            # The lexical and dedup indexes are rebuilt from the store on restore
+            self.vector_store = None
+            self.lexical_index = BM25Index()
+            self.chunk_hashes = ChunkHashIndex()
+            self.text_bytes = 0
+            self.resident_bytes = 0
+        return True
+    
+    def read_snapshot(self, path: str) -> SessionSnapshot:
+        """
+        Read an index written by save_faiss_store and rebuild the indexes over it
+        
+        Every document is read into memory so the directory may be removed afterwards.
+        Nothing on the service changes, so this is safe to run on a worker thread.
+        """
+        vector_store = load_faiss_store(path, self.embeddings, mmap=False)
+        ids = list(vector_store.index_to_docstore_id.values())
+        documents = {doc_id: vector_store.docstore.search(doc_id) for doc_id in ids}
+        vector_store.docstore = InMemoryDocstore(documents)
+        maybe_upgrade_index(vector_store)
+        return SessionSnapshot(
+            vector_store=vector_store,
+            lexical_index=BM25Index.from_vector_store(vector_store),
+            chunk_hashes=ChunkHashIndex.from_vector_store(vector_store),
+            file_hashes={doc.metadata["file_sha256"] for doc in documents.values() if "file_sha256" in doc.metadata},
+            text_bytes=sum(len(doc.page_content) for doc in documents.values())
         )
     
-    def _get_loader_for_file(self, file_path: str):
-        """Get the appropriate loader based on file extension"""
-        file_extension = os.path.splitext(file_path)[1].lower()
+    def apply_snapshot(self, snapshot: SessionSnapshot):
+        """Replace the index with one returned by read_snapshot"""
+        self.vector_store = snapshot.vector_store
+        self.lexical_index = snapshot.lexical_index
+        self.chunk_hashes = snapshot.chunk_hashes
+        self.file_hashes = snapshot.file_hashes
+        self.text_bytes = snapshot.text_bytes
+        self._update_resident_bytes()
+    
+    async def restore(self):
+        """Reload a spilled index into memory, waiting for a spill in progress to finish"""
+        async with self.index_lock:
+            path = self.spill_path
+            if path is None:
+                return
+            try:
+                snapshot = await asyncio.to_thread(self.read_snapshot, path)
+            except Exception as e:
+                logger.error(f"Error restoring session {self.session_id} from {path}, dropping its documents: {str(e)}")
+                self.cleanup()
+                return
+            if self.spill_path != path:
+                # Cleaned up while it was read
+                return
+            
+            self.apply_snapshot(snapshot)
+            self.spill_path = None
+            self.spilled_bytes = 0
+            await asyncio.to_thread(shutil.rmtree, path, True)
+        logger.info(f"Restored session {self.session_id} ({self.resident_bytes} bytes)")
+    
+    def save_temp_file(self, file_content: bytes, filename: str) -> str:
+        """Write an upload to a temporary file tracked for cleanup"""
+        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
+            temp_file.write(file_content)
+            self.temp_files.append(temp_file.name)
+        return temp_file.name
+    
+    def load_file(self, file_path: str, filename: str) -> List[Document]:
+        """Load a file and split it into chunks tagged with this session"""
+        return load_and_split(file_path, filename, self.session_id)
+    
+    def embed_splits(self, splits: List[Document]) -> Tuple[List[Document], List[List[float]], int]:
+        """
+        Embed the chunks this session has not indexed yet, without touching the index
+        
+        Returns:
+            Tuple of (unique chunks, their vectors, number of duplicates skipped)
+        """
+        unique, duplicates = self.chunk_hashes.filter_documents(splits)
+        vectors = self.embeddings.embed_documents([split.page_content for split in unique]) if unique else []
+        return unique, vectors, duplicates
+    
+    def add_embedded_splits(
+        self,
+        splits: List[Document],
+        vectors: List[List[float]],
+        duplicates: int = 0
+    ) -> Tuple[Dict, List[int]]:
+        """
+        Add embedded chunks to the vector store and the indexes built over it
+        
+        Chunks indexed since they were embedded (e.g. by another upload of the same
+        file) are skipped here.
         
-        if file_extension == '.pdf':
-            return PyPDFLoader(file_path)
-        elif file_extension in ['.docx', '.doc']:
-            return Docx2txtLoader(file_path)
-        elif file_extension in ['.ppt', '.pptx']:
-            return UnstructuredPowerPointLoader(file_path)
+        Args:
+            splits: Chunks to add
+            vectors: Their embeddings
+            duplicates: Duplicates already skipped before embedding
+        
+        Returns:
+            Tuple of (dedup report {"chunks", "added", "duplicates"}, positions of the splits added)
+        """
+        keep = self.chunk_hashes.filter_texts([split.page_content for split in splits])
+        report = {"chunks": len(splits) + duplicates, "added": len(keep), "duplicates": duplicates + len(splits) - len(keep)}
+        self.last_dedup_report = report
+        if not keep:
+            return report, keep
+        
+        texts = [splits[i].page_content for i in keep]
+        text_embeddings = list(zip(texts, [vectors[i] for i in keep]))
+        metadatas = [splits[i].metadata for i in keep]
+        
+        # Create or update the vector store
+        if self.vector_store is None:
+            logger.info(f"Creating new vector store for session {self.session_id}")
+            self.vector_store = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas)
+            ids = list(self.vector_store.index_to_docstore_id.values())
         else:
-            raise ValueError(f"Unsupported file extension: {file_extension}")
+            logger.info(f"Adding documents to existing vector store for session {self.session_id}")
+            ids = self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas)
+        
+        # Keep the lexical index in step with the vector store
+        self.lexical_index.add_many(zip(ids, texts))
+        self.chunk_hashes.add_many(zip(ids, texts))
+        self.file_hashes.update(metadata["file_sha256"] for metadata in metadatas if "file_sha256" in metadata)
+        self.text_bytes += sum(len(text) for text in texts)
+        
+        # Switch to an approximate index if this session's store has grown large
+        maybe_upgrade_index(self.vector_store)
+        self._update_resident_bytes()
+        self.index_version += 1
+        return report, keep
     
     async def process_file(self, file_content: bytes, filename: str) -> bool:
         """Process a file and add it to the vector store"""
+        self.active_writes += 1
         try:
+            await self.restore()
             # Save the file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
-                temp_file.write(file_content)
-                temp_file_path = temp_file.name
-                self.temp_files.append(temp_file_path)  # Track for cleanup
+            temp_file_path = self.save_temp_file(file_content, filename)
             
             logger.info(f"Processing file {filename} in session {self.session_id}")
             
-            # Load and process the document
-            loader = self._get_loader_for_file(temp_file_path)
-            documents = loader.load()
-            
-            if not documents:
-                logger.warning(f"No documents loaded from file {filename}")
-                return False
-                
-            logger.info(f"Loaded {len(documents)} document pages from {filename}")
-            
-            # Add session metadata to each document
-            for doc in documents:
-                if not hasattr(doc, 'metadata'):
-                    doc.metadata = {}
-                doc.metadata['session_id'] = self.session_id
-                doc.metadata['filename'] = filename
-            
-            # Split the documents
-            splits = self.text_splitter.split_documents(documents)
+            # Load and split the document
+            splits = self.load_file(temp_file_path, filename)
             
             if not splits:
                 logger.warning(f"No splits created from file {filename}")
                 return False
-                
-            logger.info(f"Created {len(splits)} chunks from {filename}")
             
-            # Create or update the vector store
-            if self.vector_store is None:
-                logger.info(f"Creating new vector store for session {self.session_id}")
-                self.vector_store = FAISS.from_documents(splits, self.embeddings)
-            else:
-                logger.info(f"Adding documents to existing vector store for session {self.session_id}")
-                self.vector_store.add_documents(splits)
+            # Skip chunks whose exact text this session has already indexed
+            unique, vectors, duplicates = self.embed_splits(splits)
+            report, _ = self.add_embedded_splits(unique, vectors, duplicates)
+            if not report["added"]:
+                logger.info(f"All {len(splits)} chunks from {filename} are already indexed in session {self.session_id}")
+                return True
             
             # Increment document count
             self.document_count += 1
             
-            # Verify vector store creation
-            if self.vector_store is None:
-                logger.error(f"Failed to create vector store for session {self.session_id}")
-                return False
-                
             logger.info(f"Successfully processed file {filename} for session {self.session_id}. Document count: {self.document_count}")
             
             return True
@@ -239,49 +652,58 @@ class DocumentQAService:
             import traceback
             logger.error(traceback.format_exc())
             return False
+        finally:
+            self.active_writes -= 1
+    
+    async def _aretrieve(self, question: str, k: int = 4) -> List[Document]:
+        """Retrieve chunks for a question with dense + lexical search"""
+        return await ahybrid_search(self.vector_store, self.lexical_index, question, k=k)
+    
+    def _pack_context(self, docs: List[Document]) -> str:
+        """Join retrieved chunks, in relevance order, within the document QA token budget"""
+        packed = pack_context([doc.page_content for doc in docs], CONTEXT_BUDGET_DOCUMENT_QA)
+        return "\n\n".join(text for _, text in packed)
+    
+    def _retrieve_context(self, inputs: Dict) -> str:
+        return self._pack_context(hybrid_search(self.vector_store, self.lexical_index, inputs["question"], k=inputs["k"]))
+    
+    async def _aretrieve_context(self, inputs: Dict) -> str:
+        return self._pack_context(await self._aretrieve(inputs["question"], k=inputs["k"]))
     
     async def query_documents(self, question: str, k: int = 4) -> Dict:
         """Query the vector store and return an answer"""
+        await self.restore()
         if self.vector_store is None:
             logger.warning(f"No vector store available for session {self.session_id}")
             return {"answer": "No documents have been processed yet. Please upload documents first.",
                     "has_documents": False}
         
+        self.active_queries += 1
         try:
-            # Create retrieval chain
-            retriever = self.vector_store.as_retriever(search_kwargs={"k": k})
-            
-            # Log retrieval attempt
-            logger.info(f"Creating retriever for session {self.session_id} with k={k}")
-            
-            # Create prompt template
-            template = """You are a helpful assistant that answers questions based on provided documents.
-            Answer the question based only on the following context:
-            {context}
-            
-            Question: {question}
-            
-            If the answer is not in the context, say "I don't have enough information to answer this question."
-            """
+            # Answer near-duplicate questions from this session's answer cache
+            query_vector = None
+            version = self.index_version
+            if ANSWER_CACHE_ENABLED:
+                query_vector = await self.embeddings.aembed_query(question)
+                cached = self.answer_cache.lookup(query_vector, version, scope=k)
+                if cached is not None:
+                    logger.info(f"Answer cache hit for session {self.session_id}")
+                    return cached
             
-            prompt = ChatPromptTemplate.from_template(template)
-            
-            # Create the chain
-            llm = self._get_llm()
-            chain = (
-                {"context": retriever, "question": RunnablePassthrough()}
-                | prompt
-                | llm
-                | StrOutputParser()
-            )
-            
-            # Execute the chain
-            logger.info(f"Executing query chain for session {self.session_id}")
-            answer = chain.invoke(question)
+            # Execute the shared chain with this session's retriever
+            logger.info(f"Executing query chain for session {self.session_id} with k={k}")
+            answer = await get_document_qa_chain(self._get_llm()).ainvoke({
+                "question": question,
+                "k": k,
+                "retriever": self.retriever
+            })
             
             logger.info(f"Query successful for session {self.session_id}")
             
-            return {"answer": answer, "has_documents": True}
+            response = {"answer": answer, "has_documents": True}
+            if query_vector is not None:
+                self.answer_cache.store(question, query_vector, response, version, scope=k)
+            return response
             
         except Exception as e:
             logger.error(f"Error querying documents for session {self.session_id}: {str(e)}")
@@ -290,6 +712,8 @@ class DocumentQAService:
             return {"answer": "An error occurred while processing your question.",
                     "has_documents": True,
                     "error": str(e)}
+        finally:
+            self.active_queries -= 1
     
     def get_document_count(self) -> int:
         """Get the number of documents in the store"""
@@ -305,9 +729,21 @@ class DocumentQAService:
             except Exception as e:
                 logger.error(f"Error deleting temp file {temp_file}: {str(e)}")
         
+        if self.spill_path:
+            shutil.rmtree(self.spill_path, ignore_errors=True)
+            self.spill_path = None
+            self.spilled_bytes = 0
+        
         # Clear references to free memory
         self.vector_store = None
+        self.resident_bytes = 0
+        self.text_bytes = 0
+        self.lexical_index = BM25Index()
+        self.chunk_hashes = ChunkHashIndex()
+        self.index_version += 1
+        self.answer_cache.clear()
         self.temp_files = []
+        self.file_hashes = set()
         self.document_count = 0
         logger.info(f"Cleaned up resources for session {self.session_id}")
 
@@ -333,12 +769,12 @@ async def get_session_service(
         session_token = session_manager.create_session()
         logger.info(f"Created new session with token: {session_token}")
         
-    session = session_manager.get_session(session_token)
+    session = await session_manager.get_session(session_token)
     if not session:
         # Session expired or invalid, create a new one
         logger.info(f"Session not found or expired: {session_token}, creating new session")
         session_token = session_manager.create_session()
-        session = session_manager.get_session(session_token)
+        session = await session_manager.get_session(session_token)
     
     # Store the session token for middleware to add to response headers
     session["token"] = session_token
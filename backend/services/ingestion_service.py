@@ -0,0 +1,267 @@
+import os
+import time
+import uuid
+import queue
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.rag_service import RAGService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bulk ingestion settings
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+# Upper bound on chunks written to the index in one commit
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "512"))
+# Finished jobs kept for the status endpoint
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "100"))
+# Server-side directories that bulk ingestion may read from
+INGEST_ALLOWED_DIRS = [
+    os.path.realpath(path.strip())
+    for path in os.getenv("INGEST_ALLOWED_DIRS", "data,uploads").split(",")
+    if path.strip()
+]
+INGEST_EXTENSIONS = (".pdf", ".txt", ".md")
+
+QUEUED = "queued"
+PARSING = "parsing"
+EMBEDDING = "embedding"
+INDEXED = "indexed"
+FAILED = "failed"
+RUNNING = "running"
+COMPLETED = "completed"
+
+
+class IngestionJob:
+    """Progress of one bulk ingestion request"""
+
+    def __init__(self, file_paths: List[str], spooled: Iterable[str] = ()):
+        self.job_id = str(uuid.uuid4())
+        # Uploaded copies the job deletes once they are read
+        self.spooled = set(spooled)
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files: Dict[str, Dict[str, Any]] = {
+            path: {"status": QUEUED, "chunks": 0, "duplicates": 0, "error": None} for path in file_paths
+        }
+        self.chunks_indexed = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def update_file(self, path: str, **fields):
+        with self._lock:
+            self.files[path].update(fields)
+
+    def record_commit(self, results: Dict[str, Tuple[int, int]]):
+        """Mark files indexed by one commit, given (chunks added, duplicates skipped) per file"""
+        with self._lock:
+            self.commits += 1
+            for path, (added, duplicates) in results.items():
+                self.chunks_indexed += added
+                self.files[path]["status"] = INDEXED
+                self.files[path]["duplicates"] += duplicates
+
+    def mark_started(self):
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.time()
+                self.status = RUNNING
+
+    def finish_if_done(self) -> bool:
+        """Close the job once every file has reached a final state"""
+        with self._lock:
+            if self.finished_at is not None:
+                return False
+            statuses = [f["status"] for f in self.files.values()]
+            if not all(status in (INDEXED, FAILED) for status in statuses):
+                return False
+            self.finished_at = time.time()
+            self.status = FAILED if all(status == FAILED for status in statuses) else COMPLETED
+            return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Job status with per-file progress and throughput"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for f in self.files.values():
+                counts[f["status"]] = counts.get(f["status"], 0) + 1
+            files = {path: dict(f) for path, f in self.files.items()}
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            done = counts.get(INDEXED, 0) + counts.get(FAILED, 0)
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "total_files": len(self.files),
+                "file_counts": counts,
+                "progress": round(done / len(self.files), 4) if self.files else 1.0,
+                "chunks_indexed": self.chunks_indexed,
+                "duplicates_skipped": sum(f["duplicates"] for f in self.files.values()),
+                "commits": self.commits,
+                "elapsed_seconds": round(elapsed, 3),
+                "files_per_second": round(done / elapsed, 3) if elapsed else 0.0,
+                "chunks_per_second": round(self.chunks_indexed / elapsed, 3) if elapsed else 0.0,
+                "files": files
+            }
+
+
+class IngestionManager:
+    """
+    Runs bulk ingestion jobs against the RAG corpus.
+
+    A bounded thread pool parses, splits and embeds files in parallel. Embedded
+    files are handed to a single committer thread, which groups whatever is ready
+    (up to INGEST_BATCH_CHUNKS chunks) into one index commit, so writes stay
+    serialized and the delta log gets one record per batch rather than per file.
+    """
+
+    def __init__(self, rag_service: RAGService, workers: int = INGEST_WORKERS, batch_chunks: int = INGEST_BATCH_CHUNKS):
+        self.rag_service = rag_service
+        self.batch_chunks = batch_chunks
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._ready: "queue.Queue" = queue.Queue()
+        self._committer = threading.Thread(target=self._commit_loop, name="ingest-committer", daemon=True)
+        self._committer.start()
+
+    def submit(self, file_paths: List[str], spooled: Iterable[str] = ()) -> IngestionJob:
+        """
+        Queue files for ingestion
+
+        Args:
+            file_paths: Paths of PDF or text files readable by the server
+            spooled: Those of file_paths that are uploaded copies, each in a
+                directory of its own; they are deleted once read
+
+        Returns:
+            The created job
+        """
+        file_paths = list(dict.fromkeys(file_paths))
+        if not file_paths:
+            raise ValueError("No files to ingest")
+        job = IngestionJob(file_paths, spooled)
+        with self._jobs_lock:
+            self.jobs[job.job_id] = job
+            self._prune_jobs()
+        for path in file_paths:
+            self.executor.submit(self._prepare_file, job, path)
+        logger.info(f"Queued ingestion job {job.job_id} with {len(file_paths)} files")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._jobs_lock:
+            return self.jobs.get(job_id)
+
+    def _prune_jobs(self):
+        """Forget the oldest finished jobs beyond INGEST_MAX_JOBS"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in (COMPLETED, FAILED)]
+        for job_id in finished[:max(0, len(self.jobs) - INGEST_MAX_JOBS)]:
+            del self.jobs[job_id]
+
+    def _prepare_file(self, job: IngestionJob, path: str):
+        """Worker: parse, split and embed one file, then hand it to the committer"""
+        job.mark_started()
+        try:
+            job.update_file(path, status=PARSING)
+            chunks = self.rag_service.split_documents(self.rag_service.load_document(path))
+            # Skip chunks that are already indexed before paying for their embeddings
+            unique, duplicates = self.rag_service.dedupe_chunks(chunks)
+            job.update_file(path, status=EMBEDDING, chunks=len(chunks), duplicates=duplicates)
+            texts, vectors, metadatas = self.rag_service.embed_chunks(unique)
+            self._ready.put((job, path, texts, vectors, metadatas))
+        except Exception as e:
+            logger.error(f"Error ingesting {path} for job {job.job_id}: {str(e)}")
+            job.update_file(path, status=FAILED, error=str(e))
+            self._finish_if_done(job)
+        finally:
+            if path in job.spooled:
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def _commit_loop(self):
+        """Committer: group ready files into batched index commits"""
+        while True:
+            batch = [self._ready.get()]
+            size = len(batch[0][2])
+            while size < self.batch_chunks:
+                try:
+                    item = self._ready.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[2])
+            self._commit(batch)
+
+    def _commit(self, batch: List[tuple]):
+        texts, vectors, metadatas, owners = [], [], [], []
+        for position, (_, _, item_texts, item_vectors, item_metadatas) in enumerate(batch):
+            texts.extend(item_texts)
+            vectors.extend(item_vectors)
+            metadatas.extend(item_metadatas)
+            owners.extend([position] * len(item_texts))
+
+        try:
+            # Chunks already indexed or repeated across files of this batch are
+            # dropped by the commit; count per file what it actually kept
+            _, keep = self.rag_service.commit_chunks(texts, vectors, metadatas)
+            kept_per_item = [0] * len(batch)
+            for index in keep:
+                kept_per_item[owners[index]] += 1
+
+            # A batch may span jobs; each job counts it as one commit
+            results: Dict[int, Tuple[IngestionJob, Dict[str, Tuple[int, int]]]] = {}
+            for position, (job, path, item_texts, _, _) in enumerate(batch):
+                kept = kept_per_item[position]
+                results.setdefault(id(job), (job, {}))[1][path] = (kept, len(item_texts) - kept)
+            for job, file_results in results.values():
+                job.record_commit(file_results)
+            logger.info(f"Committed {len(keep)} chunks from {len(batch)} files")
+        except Exception as e:
+            logger.error(f"Error committing ingestion batch: {str(e)}")
+            for job, path, _, _, _ in batch:
+                job.update_file(path, status=FAILED, error=str(e))
+
+        for job in {id(job): job for job, *_ in batch}.values():
+            self._finish_if_done(job)
+
+    def _finish_if_done(self, job: IngestionJob):
+        if job.finish_if_done():
+            logger.info(f"Ingestion job {job.job_id} finished with status {job.status}")
+
+
+def resolve_ingest_directory(directory: str) -> List[str]:
+    """
+    List ingestible files under a server-side directory
+
+    Args:
+        directory: Directory inside one of INGEST_ALLOWED_DIRS
+
+    Returns:
+        Sorted file paths
+
+    Raises:
+        ValueError: If the directory is outside the allowed roots or missing
+    """
+    real_dir = os.path.realpath(directory)
+    if not any(real_dir == root or real_dir.startswith(root + os.sep) for root in INGEST_ALLOWED_DIRS):
+        raise ValueError(f"Directory {directory} is not in an allowed ingestion root")
+    if not os.path.isdir(real_dir):
+        raise ValueError(f"Directory {directory} does not exist")
+
+    paths = []
+    for root, _, names in os.walk(real_dir):
+        for name in names:
+            if name.lower().endswith(INGEST_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
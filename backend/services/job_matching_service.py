@@ -4,7 +4,6 @@ import numpy as np
 from typing import List, Dict, Any, Optional
 from langchain_groq import ChatGroq
 from langchain.embeddings import OpenAIEmbeddings
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.schema.document import Document
 from langchain_community.vectorstores import FAISS
 from dotenv import load_dotenv
@@ -12,6 +11,10 @@ import tempfile
 from pydantic import BaseModel
 from pathlib import Path
 
+from utils.embeddings import get_embeddings
+from utils.faiss_index_manager import maybe_upgrade_index
+from utils.faiss_storage import faiss_store_exists, load_faiss_store, save_faiss_store
+
 load_dotenv()
 
 class JobMatchResponse(BaseModel):
@@ -43,20 +46,8 @@ class JobMatchingService:
         self.job_listings = None
     
     def _initialize_embeddings_model(self):
-        """Initialize embeddings model based on available API keys."""
-        try:
-            # Try to use Groq embeddings if API key is available
-            if os.getenv("GROQ_API_KEY"):
-                return HuggingFaceEmbeddings(
-                    model_name="all-MiniLM-L6-v2"
-                )
-        except Exception as e:
-            print(f"Error initializing Groq embeddings: {e}")
-        
-        # Fallback to HuggingFace embeddings
-        return HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2"
-        )
+        """Get the shared embeddings model."""
+        return get_embeddings("all-MiniLM-L6-v2")
     
     async def initialize_embeddings(self, force_refresh=False):
         """
@@ -104,14 +95,13 @@ class JobMatchingService:
             documents.append(document)
         
         # Create or load the FAISS vector store (more memory efficient than Chroma)
-        index_exists = os.path.exists(os.path.join(self.index_path, "index.faiss"))
+        index_exists = faiss_store_exists(self.index_path)
         
         if index_exists and not force_refresh:
             try:
-                self.vector_store = FAISS.load_local(
-                    self.index_path,
-                    self.embeddings
-                )
+                # Read-only after loading, so it can stay memory-mapped when FAISS_MMAP_ENABLED is set
+                self.vector_store = load_faiss_store(self.index_path, self.embeddings)
+                maybe_upgrade_index(self.vector_store)
             except Exception as e:
                 print(f"Error loading FAISS index: {e}. Creating new index.")
                 self._create_new_index(documents)
@@ -129,8 +119,11 @@ class JobMatchingService:
             embedding=self.embeddings
         )
         
-        # Save the vector store
-        self.vector_store.save_local(self.index_path)
+        # Use an approximate index if the listings have outgrown exact search
+        maybe_upgrade_index(self.vector_store)
+        
+        # Save the vector store with a memory-mappable docstore
+        save_faiss_store(self.vector_store, self.index_path)
     
     async def find_matching_jobs(self, query_text: str, top_n: int = 5) -> List[JobMatchResponse]:
         """
@@ -142,7 +135,7 @@ class JobMatchingService:
             await self.initialize_embeddings()
         
         # Search for similar documents
-        results = self.vector_store.similarity_search_with_score(query_text, k=top_n)
+        results = await self.vector_store.asimilarity_search_with_score(query_text, k=top_n)
         
         # Format results
         matching_jobs = []
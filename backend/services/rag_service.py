@@ -1,19 +1,33 @@
 import os
+import re
+import time
+import asyncio
+import threading
 import faiss
 import requests
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from langchain_community.document_loaders import TextLoader, PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-from langchain.chains import RetrievalQA
+from langchain_core.output_parsers import StrOutputParser
 from langchain_community.tools import DuckDuckGoSearchRun
 from dotenv import load_dotenv
 
+from utils.embeddings import get_embeddings
+from utils.ttl_cache import TTLCache, STALE
+from utils.faiss_persistence import IncrementalFaissStore
+from utils.faiss_index_manager import maybe_upgrade_index
+from utils.lexical_index import BM25Index, BM25View, hybrid_search, ahybrid_search
+from utils.chunk_dedup import ChunkHashIndex
+from utils.index_snapshot import IndexSnapshot, build_snapshot, empty_segment, merge_segments
+from utils.faiss_storage import load_faiss_store
+from utils.context_packing import pack_context, CONTEXT_BUDGET_RAG
+from utils.answer_cache import SemanticAnswerCache, ANSWER_CACHE_ENABLED
+from utils.llm_clients import get_llm
+
 # Load environment variables
 load_dotenv()
 
@@ -21,70 +35,349 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Per-stage timeouts (seconds) for the async chat pipeline
+RAG_RETRIEVAL_TIMEOUT = float(os.getenv("RAG_RETRIEVAL_TIMEOUT", "5"))
+RAG_SEARCH_TIMEOUT = float(os.getenv("RAG_SEARCH_TIMEOUT", "4"))
+RAG_GENERATION_TIMEOUT = float(os.getenv("RAG_GENERATION_TIMEOUT", "60"))
+
+# Web search cache: entries are fresh for SEARCH_CACHE_TTL seconds, then served
+# stale for up to SEARCH_CACHE_STALE_TTL more seconds while being refreshed
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_STALE_TTL = float(os.getenv("SEARCH_CACHE_STALE_TTL", "86400"))
+
+# Web search provider: "duckduckgo", "none", or "fake" (canned results after
+# WEB_SEARCH_FAKE_LATENCY_MS, so load tests run offline and reproducibly)
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "duckduckgo").lower()
+WEB_SEARCH_FAKE_LATENCY_MS = float(os.getenv("WEB_SEARCH_FAKE_LATENCY_MS", "200"))
+
+# Number of ingestion batches appended to the delta log before it is compacted into a snapshot
+RAG_COMPACT_EVERY = int(os.getenv("RAG_COMPACT_EVERY", "50"))
+
+GHANA_PROMPT_TEMPLATE = """You are GhanaGPT, a helpful assistant specializing in Ghanaian culture, 
+language, proverbs, current events, and general knowledge about Ghana.
+
+Use the following context to answer the question. The context contains documents 
+from our knowledge base and web search results. If the answer is not in the context, 
+use your knowledge but make it clear what information comes from where. Always be 
+respectful and provide culturally accurate information.
+
+If asked about slang, ensure you explain the meaning accurately and provide example usage.
+If asked about proverbs, explain their meaning and cultural context.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+GHANA_PROMPT = PromptTemplate(template=GHANA_PROMPT_TEMPLATE, input_variables=["context", "question"])
+
+class FakeSearchRun:
+    """Offline stand-in for DuckDuckGoSearchRun with a fixed latency"""
+    
+    def __init__(self, latency_ms: float = WEB_SEARCH_FAKE_LATENCY_MS):
+        self.latency = latency_ms / 1000
+    
+    def run(self, query: str) -> str:
+        time.sleep(self.latency)
+        return "\n\n".join(f"{query}: canned web result {i + 1}." for i in range(3))
+
 class RAGService:
     def __init__(self):
         """
         Initialize the RAG service with HuggingFace embeddings and Groq LLM
         """
         # Use a sentence-transformer model that's good for semantic search
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2"
-        )
+        self.embeddings = get_embeddings("sentence-transformers/all-mpnet-base-v2")
         logger.info("Using HuggingFace embeddings")
         
-        # Setup DuckDuckGo search which doesn't require API keys
-        self.search = DuckDuckGoSearchRun()
-        self.search_enabled = True
-        logger.info("DuckDuckGo Search enabled")
-        
-        # Initialize the vector store
-        self.vector_store = None
-        
-        # Path for storing the index
+        # Web search: DuckDuckGo needs no API key; the fake provider is for offline load tests
+        if WEB_SEARCH_BACKEND == "fake":
+            self.search = FakeSearchRun()
+        else:
+            self.search = DuckDuckGoSearchRun()
+        self.search_enabled = WEB_SEARCH_BACKEND != "none"
+        self.search_cache = TTLCache(
+            max_entries=SEARCH_CACHE_MAX_ENTRIES,
+            ttl=SEARCH_CACHE_TTL,
+            stale_ttl=SEARCH_CACHE_STALE_TTL
+        )
+        logger.info(f"Web search backend: {WEB_SEARCH_BACKEND}")
+        
+        # Published index version: vector store segments and lexical index view.
+        # Readers use whatever snapshot is current; writers publish a new one.
+        self.snapshot: Optional[IndexSnapshot] = None
+        # Append-only indexes shared by every snapshot. The chunk hash map is only
+        # consulted by writers, so it is not versioned.
+        self.bm25_index = BM25Index()
+        self.chunk_hashes = ChunkHashIndex()
+        # Serializes index commits from request handlers and ingestion workers
+        self.write_lock = threading.RLock()
+        self._compacting = False
+        # Leading segments a running compaction replaces; commits leave them unmerged
+        self._folding = 1
+        
+        # Keyed by snapshot version, so cached answers from an older corpus are dropped
+        self.answer_cache = SemanticAnswerCache()
+        
+        # Path for storing the index (snapshot plus append-only delta log)
         self.index_path = "faiss_index"
+        self.index_store = IncrementalFaissStore(self.index_path, self.embeddings, compact_every=RAG_COMPACT_EVERY)
         
-        # Use Groq for LLM
+        # Use the shared Groq client, with the answer chain built once
         api = os.getenv("GROQ_API_KEY")
         if api:
-            self.llm = ChatGroq(
-                api_key=api,
-                model_name="llama3-70b-8192", 
-                temperature=0.4
-            )
+            self.llm = get_llm(api, temperature=0.4)
+            self.chain = GHANA_PROMPT | self.llm | StrOutputParser()
             logger.info("Using Groq for generation")
         else:
             logger.warning("Groq API key not found, response generation will be limited")
             self.llm = None
+            self.chain = None
         
         # Load index if it exists
         self._load_or_create_index()
     
-    def _load_or_create_index(self):
-        """Load existing index or create a new one"""
-        if os.path.exists(self.index_path) and os.path.isdir(self.index_path):
-            try:
-                self.vector_store = FAISS.load_local(
-                    self.index_path, self.embeddings
-                )
+    @property
+    def vector_store(self) -> Optional[FAISS]:
+        return self.snapshot.vector_store if self.snapshot else None
+    
+    @property
+    def lexical_index(self) -> Optional[BM25View]:
+        return self.snapshot.lexical_index if self.snapshot else None
+    
+    @property
+    def index_version(self) -> int:
+        return self.snapshot.version if self.snapshot else 0
+    
+    def _load_or_create_index(self, version: int = 0):
+        """Load existing index or create a new one, published as the given version"""
+        with self.index_store.locked():
+            self._load_or_create_locked(version)
+    
+    def _load_or_create_locked(self, version: int):
+        vector_store = None
+        try:
+            vector_store = self.index_store.load()
+            if vector_store is not None:
+                maybe_upgrade_index(vector_store)
                 logger.info(f"Loaded existing index from {self.index_path}")
-            except Exception as e:
-                logger.error(f"Error loading index: {str(e)}")
-                self.vector_store = None
+        except Exception as e:
+            logger.error(f"Error loading index: {str(e)}")
+            vector_store = None
         
-        if self.vector_store is None:
+        if vector_store is None:
             # Create an empty vector store if loading failed
-            self.vector_store = FAISS.from_documents(
+            vector_store = FAISS.from_documents(
                 [Document(page_content="Ghana placeholder document", metadata={"source": "init"})],
                 self.embeddings
             )
             logger.info("Created new empty vector store")
-            self._save_index()
+            self.index_store.compact(vector_store)
+        
+        self.bm25_index = BM25Index.from_vector_store(vector_store)
+        logger.info(f"Built lexical index over {len(self.bm25_index)} chunks")
+        self.chunk_hashes = ChunkHashIndex.from_vector_store(vector_store)
+        self.snapshot = build_snapshot((vector_store,), self.bm25_index, version=version, seq=self.index_store.last_seq)
+    
+    def _compact(self):
+        """
+        Fold the segments of the current snapshot into one base and save it to disk
+        
+        The merged store is written as the new on-disk snapshot and then loaded back
+        from it, so the base is memory-mapped again where FAISS_MMAP_ENABLED is set.
+        Commits published meanwhile stay on as segments after the new base.
+        """
+        with self.write_lock:
+            snapshot = self.snapshot
+            self._folding = len(snapshot.segments)
+        try:
+            self._fold(snapshot)
+        finally:
+            self._folding = 1
+    
+    def _fold(self, snapshot: IndexSnapshot):
+        """Merge, save, reload and publish the segments of snapshot as the new base"""
+        merged = merge_segments(snapshot.segments, copy_documents=False)
+        # Switch to an approximate index once the corpus is large enough
+        maybe_upgrade_index(merged)
+        snapshot_dir = self.index_store.compact(merged, snapshot.seq)
+        del merged
+        if snapshot_dir is None:
+            # Another worker compacted further; this one picks its snapshot up when it falls behind
+            return
+        try:
+            base = load_faiss_store(snapshot_dir, self.embeddings)
+        except (OSError, RuntimeError):
+            if self.index_store.published_seq == snapshot.seq:
+                raise
+            logger.info(f"Snapshot {snapshot_dir} was replaced by another worker before it was loaded")
+            return
+        maybe_upgrade_index(base)
+        
+        folded = len(snapshot.segments)
+        with self.write_lock:
+            current = self.snapshot
+            if any(ours is not theirs for ours, theirs in zip(snapshot.segments, current.segments[:folded])):
+                logger.warning("Index segments changed during compaction, keeping them until the next one")
+                return
+            # Same documents as before, so the version (and the answer cache) stays
+            self.snapshot = build_snapshot((base,) + current.segments[folded:], self.bm25_index, current.version, current.seq)
+        logger.info(f"Compacted {folded} index segments into {snapshot_dir}")
+    
+    def _compact_in_background(self):
+        """Run _compact() on a background thread unless one is already running"""
+        with self.write_lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        
+        def run():
+            try:
+                self._compact()
+            except Exception as e:
+                logger.error(f"Error compacting index at {self.index_path}: {str(e)}")
+            finally:
+                self._compacting = False
+        
+        threading.Thread(target=run, name="faiss-compaction", daemon=True).start()
+    
+    def dedupe_chunks(self, chunked_documents: List[Document]) -> Tuple[List[Document], int]:
+        """
+        Drop chunks whose exact text is already indexed, before paying for embeddings
+        
+        Returns:
+            Tuple of (unique chunks, number of duplicates skipped)
+        """
+        return self.chunk_hashes.filter_documents(chunked_documents)
+    
+    def embed_chunks(self, chunked_documents: List[Document]) -> Tuple[List[str], List[List[float]], List[Dict]]:
+        """
+        Embed chunks without touching the index
+        
+        Args:
+            chunked_documents: Chunks to embed
+            
+        Returns:
+            Tuple of (texts, vectors, metadatas)
+        """
+        texts = [doc.page_content for doc in chunked_documents]
+        metadatas = [doc.metadata for doc in chunked_documents]
+        vectors = self.embeddings.embed_documents(texts) if texts else []
+        return texts, vectors, metadatas
+    
+    def commit_chunks(self, texts: List[str], vectors: List[List[float]], metadatas: List[Dict]) -> Tuple[List[str], List[int]]:
+        """
+        Append embedded chunks to the vector store and its delta log as one commit
+        
+        Chunks already indexed (e.g. by a concurrent upload of the same file) or
+        repeated within texts are dropped here, so fewer chunks than texts may be added.
+        
+        The chunks go into a new segment that is published with the existing ones
+        in a new snapshot, so queries running meanwhile keep searching the previous
+        version and never see a half-applied write. Small trailing segments are
+        merged as they accumulate, keeping the segment count logarithmic, and a
+        background compaction folds them into the base every RAG_COMPACT_EVERY commits.
+        
+        Returns:
+            Tuple of (docstore ids of the added chunks, their positions in texts)
+        """
+        with self.write_lock, self.index_store.locked():
+            # Other workers may have committed to the shared log since this one last looked
+            self._catch_up()
+            keep = self.chunk_hashes.filter_texts(texts)
+            if not keep:
+                return [], []
+            if len(keep) < len(texts):
+                texts = [texts[i] for i in keep]
+                vectors = [vectors[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+            
+            segment = empty_segment(self.snapshot.segments[0])
+            ids = self.index_store.append(segment, texts, vectors, metadatas)
+            self._publish_segment(segment, ids, texts)
+        return ids, keep
+    
+    def _publish_segment(self, segment: FAISS, ids: List[str], texts: List[str]):
+        """Publish a snapshot with one more segment holding the given chunks; hold write_lock"""
+        snapshot = self.snapshot
+        self.bm25_index.add_many(zip(ids, texts))
+        self.chunk_hashes.add_many(zip(ids, texts))
+        
+        # Merge the newest segments while the older one is at most twice the newer,
+        # so each vector is copied O(log n) times; the base and any segments being
+        # compacted are left to compaction
+        segments = snapshot.segments + (segment,)
+        while len(segments) - 2 >= self._folding and segments[-2].index.ntotal <= 2 * segments[-1].index.ntotal:
+            segments = segments[:-2] + (merge_segments(segments[-2:]),)
+        
+        self.snapshot = build_snapshot(segments, self.bm25_index, snapshot.version + 1, self.index_store.last_seq)
+        if self.index_store.needs_compaction:
+            self._compact_in_background()
+    
+    def _catch_up(self):
+        """
+        Apply commits other workers logged to the shared index directory
+        
+        Hold write_lock and the index store's lock. If another worker compacted
+        commits this one never saw, the whole index is reloaded from its snapshot.
+        """
+        records = self.index_store.read_new_deltas()
+        if records is None:
+            logger.info(f"Index at {self.index_path} was compacted by another worker, reloading it")
+            self._load_or_create_locked(self.index_version + 1)
+            return
+        if not records:
+            return
+        segment = empty_segment(self.snapshot.segments[0])
+        ids = self.index_store.replay(segment, records)
+        self._publish_segment(segment, ids, [text for record in records for text in record["texts"]])
+        logger.info(f"Applied {len(records)} index commits from other workers")
+    
+    def refresh(self):
+        """Pick up commits other workers made to the shared index, if there are any"""
+        if not self.index_store.changed_on_disk():
+            return
+        with self.write_lock, self.index_store.locked():
+            self._catch_up()
     
-    def _save_index(self):
-        """Save the FAISS index to disk"""
-        if self.vector_store:
-            self.vector_store.save_local(self.index_path)
-            logger.info(f"Saved index to {self.index_path}")
+    async def arefresh(self):
+        """refresh() without blocking the event loop"""
+        if self.index_store.changed_on_disk():
+            await asyncio.to_thread(self.refresh)
+    
+    def _add_chunks(self, chunked_documents: List[Document]) -> Dict[str, int]:
+        """
+        Embed new chunks and append them to the vector store and its delta log
+        
+        Args:
+            chunked_documents: Chunks to add
+            
+        Returns:
+            Dedup report with the number of chunks seen, added and skipped as duplicates
+        """
+        unique, _ = self.dedupe_chunks(chunked_documents)
+        ids, _ = self.commit_chunks(*self.embed_chunks(unique))
+        return {
+            "chunks": len(chunked_documents),
+            "added": len(ids),
+            "duplicates": len(chunked_documents) - len(ids)
+        }
+    
+    def load_document(self, file_path: str) -> List[Document]:
+        """
+        Load a single document, raising on failure
+        
+        Args:
+            file_path: Path of the PDF or text file to load
+        """
+        if file_path.endswith('.pdf'):
+            loader = PyPDFLoader(file_path)
+        else:
+            loader = TextLoader(file_path)
+        return loader.load()
     
     def load_documents(self, file_paths: List[str]):
         """
@@ -97,12 +390,7 @@ class RAGService:
         
         for file_path in file_paths:
             try:
-                if file_path.endswith('.pdf'):
-                    loader = PyPDFLoader(file_path)
-                else:
-                    loader = TextLoader(file_path)
-                
-                docs = loader.load()
+                docs = self.load_document(file_path)
                 documents.extend(docs)
                 logger.info(f"Loaded document: {file_path}")
             except Exception as e:
@@ -110,27 +398,83 @@ class RAGService:
         
         return documents
     
-    def process_documents(self, documents: List[Document]):
+    def split_documents(self, documents: List[Document]) -> List[Document]:
         """
-        Process documents by splitting them and adding to the vector store
+        Split documents into chunks for indexing
         
         Args:
-            documents: List of documents to process
+            documents: List of documents to split
         """
-        # Split documents into chunks
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
             length_function=len,
         )
-        chunked_documents = text_splitter.split_documents(documents)
+        return text_splitter.split_documents(documents)
+    
+    def process_documents(self, documents: List[Document]):
+        """
+        Process documents by splitting them and adding to the vector store
+        
+        Args:
+            documents: List of documents to process
+            
+        Returns:
+            Dedup report from _add_chunks
+        """
+        # Split documents into chunks
+        chunked_documents = self.split_documents(documents)
+        
+        # Add new chunks to the vector store and persist them as one delta
+        report = self._add_chunks(chunked_documents)
+        logger.info(f"Added {report['added']} chunks to the vector store ({report['duplicates']} duplicates skipped)")
+        return report
+    
+    def _format_search_results(self, results_text: str, num_results: int) -> List[str]:
+        """Split DuckDuckGo's result text into numbered snippets"""
+        # Basic parsing of the results
+        # This is simple; in production you might want a more robust parser
+        results = results_text.split("\n\n")[:num_results]
+        
+        # Format snippets
+        snippets = []
+        for i, result in enumerate(results):
+            snippets.append(f"Search Result {i+1}: {result}")
+        
+        return snippets
+    
+    def _search_cache_key(self, query: str) -> str:
+        """Normalize a query so trivially different phrasings share a cache entry"""
+        return " ".join(re.findall(r"\w+", query.lower()))
+    
+    def _fetch_search_results(self, query: str) -> str:
+        """Call DuckDuckGo, which returns a single string with results"""
+        return self.search.run(f"Ghana {query}")
+    
+    def _refresh_search_in_background(self, key: str, query: str):
+        """Revalidate a stale search cache entry on a background thread"""
+        if not self.search_cache.begin_refresh(key):
+            return
         
-        # Add documents to the vector store
-        self.vector_store.add_documents(chunked_documents)
-        logger.info(f"Added {len(chunked_documents)} chunks to the vector store")
+        def refresh():
+            succeeded = False
+            try:
+                self.search_cache.set(key, self._fetch_search_results(query))
+                succeeded = True
+            except Exception as e:
+                logger.error(f"Error refreshing cached web search: {str(e)}")
+            finally:
+                self.search_cache.end_refresh(key, succeeded)
         
-        # Save the updated index
-        self._save_index()
+        threading.Thread(target=refresh, name="search-cache-refresh", daemon=True).start()
+    
+    def _cached_search(self, query: str) -> Tuple[Optional[str], str]:
+        """Look up cached results, kicking off a refresh when they are stale"""
+        key = self._search_cache_key(query)
+        results_text, state = self.search_cache.get(key)
+        if state == STALE:
+            self._refresh_search_in_background(key, query)
+        return results_text, key
     
     def search_web(self, query: str, num_results: int = 3) -> List[str]:
         """
@@ -148,20 +492,37 @@ class RAGService:
             return []
         
         try:
-            search_query = f"Ghana {query}"
-            # DuckDuckGo returns a single string with results
-            results_text = self.search.run(search_query)
-            
-            # Basic parsing of the results
-            # This is simple; in production you might want a more robust parser
-            results = results_text.split("\n\n")[:num_results]
-            
-            # Format snippets
-            snippets = []
-            for i, result in enumerate(results):
-                snippets.append(f"Search Result {i+1}: {result}")
+            results_text, key = self._cached_search(query)
+            if results_text is None:
+                results_text = self._fetch_search_results(query)
+                self.search_cache.set(key, results_text)
+            return self._format_search_results(results_text, num_results)
+        except Exception as e:
+            logger.error(f"Error during web search: {str(e)}")
+            return []
+    
+    async def asearch_web(self, query: str, num_results: int = 3) -> List[str]:
+        """
+        Search the web without blocking the event loop
+        
+        Args:
+            query: The search query
+            num_results: Number of results to return
             
-            return snippets
+        Returns:
+            List of search result snippets
+        """
+        if not self.search_enabled:
+            logger.warning("Web search is not enabled")
+            return []
+        
+        try:
+            results_text, key = self._cached_search(query)
+            if results_text is None:
+                # The DuckDuckGo client is synchronous, so run it on a worker thread
+                results_text = await asyncio.to_thread(self._fetch_search_results, query)
+                self.search_cache.set(key, results_text)
+            return self._format_search_results(results_text, num_results)
         except Exception as e:
             logger.error(f"Error during web search: {str(e)}")
             return []
@@ -177,13 +538,50 @@ class RAGService:
         Returns:
             List of relevant documents
         """
-        if not self.vector_store:
+        self.refresh()
+        snapshot = self.snapshot
+        if not snapshot:
             return []
         
-        # Search for relevant documents
-        docs = self.vector_store.similarity_search(query, k=top_k)
+        # Search for relevant documents with dense + lexical retrieval
+        docs = hybrid_search(snapshot.vector_store, snapshot.lexical_index, query, k=top_k)
         return docs
     
+    async def aretrieve_relevant_info(self, query: str, top_k: int = 5) -> List[Document]:
+        """
+        Retrieve relevant documents for a query without blocking the event loop
+        
+        Args:
+            query: User query
+            top_k: Number of documents to retrieve
+            
+        Returns:
+            List of relevant documents
+        """
+        await self.arefresh()
+        snapshot = self.snapshot
+        if not snapshot:
+            return []
+        
+        return await ahybrid_search(snapshot.vector_store, snapshot.lexical_index, query, k=top_k)
+    
+    def _build_context(self, relevant_docs: List[Document], search_results: List[str]) -> Tuple[str, List[str]]:
+        """Combine retrieved documents and search results into one prompt context"""
+        # Documents in retrieval order, then web snippets, packed into the token budget
+        items = [f"[Document {i+1}]: {doc.page_content}" for i, doc in enumerate(relevant_docs)]
+        items.extend(search_results)
+        packed = pack_context(items, CONTEXT_BUDGET_RAG)
+        
+        combined_context = "".join(f"{text}\n\n" for _, text in packed)
+        sources = []
+        for position, _ in packed:
+            if position < len(relevant_docs):
+                source = relevant_docs[position].metadata.get("source")
+                if source and source != "init":
+                    sources.append(source)
+        
+        return combined_context, list(set(sources))  # Remove duplicates
+    
     def generate_response(self, query: str) -> Dict[str, Any]:
         """
         Generate a response for the given query
@@ -200,56 +598,97 @@ class RAGService:
         # Get web search results
         search_results = self.search_web(query)
         
-        # Combine retrieved documents and search results
-        combined_context = ""
-        sources = []
+        combined_context, sources = self._build_context(relevant_docs, search_results)
+        
+        # If we have the LLM, answer from the context we already retrieved in a single call
+        if self.llm:
+            try:
+                answer = self.chain.invoke({"context": combined_context, "question": query})
+            except Exception as e:
+                logger.error(f"Error during response generation: {str(e)}")
+                answer = f"Sorry, I encountered an error while generating a response: {str(e)}"
+        else:
+            # Fallback if no LLM is available
+            answer = "I'm sorry, but I'm currently unable to generate a response. The Groq API key is missing."
         
-        # Add document content
-        for i, doc in enumerate(relevant_docs):
-            combined_context += f"[Document {i+1}]: {doc.page_content}\n\n"
-            if doc.metadata.get("source") and doc.metadata.get("source") != "init":
-                sources.append(doc.metadata.get("source"))
+        return {
+            "answer": answer,
+            "sources": sources,
+            "search_results": len(search_results) > 0
+        }
+    
+    async def _agather_context(self, query: str) -> Tuple[str, List[str], bool]:
+        """
+        Run vector retrieval and web search concurrently, each with its own timeout.
         
-        # Add search results
-        for i, result in enumerate(search_results):
-            combined_context += f"{result}\n\n"
+        A stage that fails or times out contributes no context instead of failing
+        the request.
         
-        # Create prompt
-        prompt_template = """You are GhanaGPT, a helpful assistant specializing in Ghanaian culture, 
-        language, proverbs, current events, and general knowledge about Ghana.
+        Returns:
+            Tuple of (combined context, sources, whether web results were found)
+        """
+        relevant_docs, search_results = await asyncio.gather(
+            asyncio.wait_for(self.aretrieve_relevant_info(query), RAG_RETRIEVAL_TIMEOUT),
+            asyncio.wait_for(self.asearch_web(query), RAG_SEARCH_TIMEOUT),
+            return_exceptions=True
+        )
         
-        Use the following context to answer the question. If the answer is not 
-        in the context, use your knowledge but make it clear what information comes from 
-        where. Always be respectful and provide culturally accurate information.
+        if isinstance(relevant_docs, BaseException):
+            logger.warning(f"Vector retrieval failed or timed out: {relevant_docs!r}")
+            relevant_docs = []
+        if isinstance(search_results, BaseException):
+            logger.warning(f"Web search failed or timed out: {search_results!r}")
+            search_results = []
         
-        If asked about slang, ensure you explain the meaning accurately and provide example usage.
-        If asked about proverbs, explain their meaning and cultural context.
+        combined_context, sources = self._build_context(relevant_docs, search_results)
+        return combined_context, sources, len(search_results) > 0
+    
+    async def _alookup_answer(self, query: str) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """
+        Look a question up in the semantic answer cache
         
-        Context:
-        {context}
+        Returns:
+            Tuple of (cached response or None, question embedding for storing the answer)
+        """
+        if not ANSWER_CACHE_ENABLED:
+            return None, None
+        # A commit by another worker changes the version, so its answers are not reused
+        await self.arefresh()
+        try:
+            query_vector = await self.embeddings.aembed_query(query)
+        except Exception as e:
+            logger.error(f"Error embedding question for the answer cache: {str(e)}")
+            return None, None
+        return self.answer_cache.lookup(query_vector, self.index_version), query_vector
+    
+    async def agenerate_response(self, query: str) -> Dict[str, Any]:
+        """
+        Generate a response for the given query without blocking the event loop
         
-        Question: {question}
+        Args:
+            query: User query
+            
+        Returns:
+            Dictionary containing the response and source information
+        """
+        cached, query_vector = await self._alookup_answer(query)
+        if cached is not None:
+            return cached
         
-        Answer:"""
+        version = self.index_version
+        combined_context, sources, has_search_results = await self._agather_context(query)
+        answered = False
         
-        # If we have the LLM, use it to generate a response
         if self.llm:
-            prompt = PromptTemplate(
-                template=prompt_template,
-                input_variables=["context", "question"]
-            )
-            
-            qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=self.vector_store.as_retriever(),
-                chain_type_kwargs={"prompt": prompt}
-            )
-            
             try:
-                # Get answer
-                result = qa_chain.invoke({"query": query})
-                answer = result.get("result", "")
+                answer = await asyncio.wait_for(
+                    self.chain.ainvoke({"context": combined_context, "question": query}),
+                    RAG_GENERATION_TIMEOUT
+                )
+                answered = True
+            except asyncio.TimeoutError:
+                logger.error(f"Response generation timed out after {RAG_GENERATION_TIMEOUT}s")
+                answer = "Sorry, generating a response took too long. Please try again."
             except Exception as e:
                 logger.error(f"Error during response generation: {str(e)}")
                 answer = f"Sorry, I encountered an error while generating a response: {str(e)}"
@@ -257,11 +696,70 @@ class RAGService:
             # Fallback if no LLM is available
             answer = "I'm sorry, but I'm currently unable to generate a response. The Groq API key is missing."
         
-        return {
+        response = {
             "answer": answer,
-            "sources": list(set(sources)),  # Remove duplicates
-            "search_results": len(search_results) > 0
+            "sources": sources,
+            "search_results": has_search_results
         }
+        if answered and query_vector is not None:
+            self.answer_cache.store(query, query_vector, response, version)
+        return response
+    
+    async def astream_response(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a response for the given query as it is generated
+        
+        Args:
+            query: User query
+            
+        Yields:
+            {"type": "token", "content": ...} events while the answer is generated,
+            an {"type": "error", "message": ...} event if generation fails, then a final
+            {"type": "done", "sources": ..., "search_results": ...} event
+        """
+        cached, query_vector = await self._alookup_answer(query)
+        if cached is not None:
+            yield {"type": "token", "content": cached["answer"]}
+            yield {"type": "done", "sources": cached["sources"], "search_results": cached["search_results"]}
+            return
+        
+        version = self.index_version
+        combined_context, sources, has_search_results = await self._agather_context(query)
+        
+        if self.llm:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + RAG_GENERATION_TIMEOUT
+            stream = self.chain.astream({"context": combined_context, "question": query}).__aiter__()
+            chunks = []
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), deadline - loop.time())
+                    except StopAsyncIteration:
+                        break
+                    if chunk:
+                        chunks.append(chunk)
+                        yield {"type": "token", "content": chunk}
+                
+                if query_vector is not None:
+                    self.answer_cache.store(query, query_vector, {
+                        "answer": "".join(chunks),
+                        "sources": sources,
+                        "search_results": has_search_results
+                    }, version)
+            except asyncio.TimeoutError:
+                logger.error(f"Response streaming timed out after {RAG_GENERATION_TIMEOUT}s")
+                yield {"type": "error", "message": "Sorry, generating a response took too long. Please try again."}
+            except Exception as e:
+                logger.error(f"Error during response streaming: {str(e)}")
+                yield {"type": "error", "message": f"Sorry, I encountered an error while generating a response: {str(e)}"}
+        else:
+            yield {
+                "type": "token",
+                "content": "I'm sorry, but I'm currently unable to generate a response. The Groq API key is missing."
+            }
+        
+        yield {"type": "done", "sources": sources, "search_results": has_search_results}
 
     def add_document_from_text(self, text: str, source: str = "manual_input"):
         """
@@ -270,23 +768,18 @@ class RAGService:
         Args:
             text: The text content to add
             source: Source identifier for the text
+            
+        Returns:
+            Dedup report from _add_chunks
         """
         doc = Document(page_content=text, metadata={"source": source})
         docs = [doc]
         
         # Split and add to vector store
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        chunked_documents = text_splitter.split_documents(docs)
-        
-        # Add to vector store
-        self.vector_store.add_documents(chunked_documents)
-        logger.info(f"Added document from text with source '{source}'")
+        chunked_documents = self.split_documents(docs)
         
-        # Save the updated index
-        self._save_index()
+        # Add new chunks to vector store and persist as one delta
+        report = self._add_chunks(chunked_documents)
+        logger.info(f"Added document from text with source '{source}' ({report['duplicates']} duplicate chunks skipped)")
         
-        return len(chunked_documents)
\ No newline at end of file
+        return report
\ No newline at end of file
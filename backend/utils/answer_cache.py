@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+
+from utils.embeddings import normalize_rows, top_k_similarities
+
+# Semantic answer cache settings
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_SESSION_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_SESSION_MAX_ENTRIES", "100"))
+
+
+class SemanticAnswerCache:
+    """
+    Cache of previously generated answers, looked up by question similarity.
+
+    Question embeddings live in a small in-memory matrix. A lookup returns the
+    stored answer of the most similar earlier question when the cosine similarity
+    reaches ``threshold``. Every entry belongs to an index version; when the
+    caller's version changes (documents were added) the whole cache is dropped.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version: Optional[Hashable] = None
+        self.entries: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: Hashable):
+        """Drop every entry if the underlying index changed"""
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries = []
+            self._matrix = None
+            self.version = version
+
+    def _expire(self):
+        """Drop entries older than the TTL"""
+        cutoff = time.monotonic() - self.ttl
+        if self.entries and self.entries[0]["created_at"] < cutoff:
+            self.entries = [entry for entry in self.entries if entry["created_at"] >= cutoff]
+            self._matrix = None
+
+    def _vectors(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.stack([entry["vector"] for entry in self.entries])
+        return self._matrix
+
+    def lookup(self, question_vector: List[float], version: Hashable, scope: Hashable = None) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a question.
+
+        Args:
+            question_vector: Embedding of the question
+            version: Current version of the index the answers were generated from
+            scope: Extra key answers must match (e.g. retrieval parameters)
+
+        Returns:
+            The cached payload, or None on a miss
+        """
+        with self._lock:
+            self._check_version(version)
+            self._expire()
+            if not self.entries:
+                self.misses += 1
+                return None
+
+            indices, scores = top_k_similarities(normalize_rows(question_vector), self._vectors(), len(self.entries))
+            for index, score in zip(indices[0], scores[0]):
+                if score < self.threshold:
+                    break
+                entry = self.entries[index]
+                if entry["scope"] == scope:
+                    self.hits += 1
+                    return dict(entry["payload"])
+
+            self.misses += 1
+            return None
+
+    def store(self, question: str, question_vector: List[float], payload: Dict[str, Any], version: Hashable, scope: Hashable = None):
+        """
+        Cache the answer generated for a question
+
+        An answer generated from a version other than the cache's current one
+        (the index changed while it was being generated) is dropped, so a late
+        store never wipes newer entries or rolls the version back.
+        """
+        with self._lock:
+            if self.version is not None and version != self.version:
+                return
+            self._check_version(version)
+            self.entries.append({
+                "question": question,
+                "vector": normalize_rows(question_vector)[0],
+                "payload": dict(payload),
+                "scope": scope,
+                "created_at": time.monotonic()
+            })
+            if len(self.entries) > self.max_entries:
+                self.entries = self.entries[-self.max_entries:]
+            self._matrix = None
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self.entries = []
+            self._matrix = None
+
+    def stats(self) -> Dict:
+        """Hit rate and settings"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,65 @@
+from typing import Dict, Iterable, List, Tuple
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from utils.embedding_cache import text_hash
+
+
+class ChunkHashIndex:
+    """
+    Map of chunk content hash to vector store docstore id.
+
+    Used at ingestion time to skip chunks whose exact text is already indexed, so
+    re-uploading a document does not add copies to the vector store.
+    """
+
+    def __init__(self):
+        self.ids_by_hash: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids_by_hash)
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        """Record (doc_id, text) pairs"""
+        for doc_id, text in items:
+            self.ids_by_hash.setdefault(text_hash(text), doc_id)
+
+    def filter_texts(self, texts: List[str]) -> List[int]:
+        """
+        Positions of texts that are neither indexed nor repeated earlier in the list
+
+        Args:
+            texts: Chunk texts in ingestion order
+
+        Returns:
+            Indices of the texts to keep
+        """
+        seen = set()
+        keep = []
+        for position, text in enumerate(texts):
+            digest = text_hash(text)
+            if digest in self.ids_by_hash or digest in seen:
+                continue
+            seen.add(digest)
+            keep.append(position)
+        return keep
+
+    def filter_documents(self, documents: List[Document]) -> Tuple[List[Document], int]:
+        """
+        Drop chunks that are already indexed or duplicated within the batch
+
+        Returns:
+            Tuple of (unique chunks, number of duplicates skipped)
+        """
+        keep = self.filter_texts([doc.page_content for doc in documents])
+        return [documents[position] for position in keep], len(documents) - len(keep)
+
+    @classmethod
+    def from_vector_store(cls, vector_store: FAISS) -> "ChunkHashIndex":
+        """Build the map over every document already in a FAISS store"""
+        index = cls()
+        for doc_id in vector_store.index_to_docstore_id.values():
+            doc = vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                index.add_many([(doc_id, doc.page_content)])
+        return index
@@ -0,0 +1,141 @@
+import os
+import re
+import math
+import logging
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prompt context budgets in tokens, per endpoint. llama3-70b-8192 has an 8192-token
+# window shared by the prompt template, the context and the generated answer.
+CONTEXT_BUDGET_RAG = int(os.getenv("CONTEXT_BUDGET_RAG", "3000"))
+CONTEXT_BUDGET_DOCUMENT_QA = int(os.getenv("CONTEXT_BUDGET_DOCUMENT_QA", "3000"))
+CONTEXT_BUDGET_CV = int(os.getenv("CONTEXT_BUDGET_CV", "4000"))
+CONTEXT_BUDGET_COVER_LETTER = int(os.getenv("CONTEXT_BUDGET_COVER_LETTER", "1500"))
+
+# A trimmed item shorter than this is dropped instead; a stub rarely helps the answer
+CONTEXT_MIN_ITEM_TOKENS = int(os.getenv("CONTEXT_MIN_ITEM_TOKENS", "64"))
+
+# Optional tokenizer.json of the generation model for exact counts. Without it,
+# tokens are estimated from characters (about 4 per token for Llama 3 on English).
+CONTEXT_TOKENIZER_PATH = os.getenv("CONTEXT_TOKENIZER_PATH")
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "4"))
+
+WHITESPACE_RUN = re.compile(r"[ \t\r\f\v]+")
+BLANK_LINES = re.compile(r"\n\s*\n+")
+
+_tokenizer = None
+_tokenizer_loaded = False
+
+
+def _get_tokenizer():
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        _tokenizer_loaded = True
+        if CONTEXT_TOKENIZER_PATH:
+            try:
+                from tokenizers import Tokenizer
+                _tokenizer = Tokenizer.from_file(CONTEXT_TOKENIZER_PATH)
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer {CONTEXT_TOKENIZER_PATH}, estimating tokens: {str(e)}")
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text, exact with CONTEXT_TOKENIZER_PATH, estimated otherwise"""
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return math.ceil(len(text) / CONTEXT_CHARS_PER_TOKEN)
+
+
+def compact_whitespace(text: str) -> str:
+    """Collapse runs of spaces and blank lines (PDF extraction produces plenty of both)"""
+    return BLANK_LINES.sub("\n\n", WHITESPACE_RUN.sub(" ", text)).strip()
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text to at most max_tokens, preferring to end on a word boundary
+
+    Args:
+        text: Text to cut
+        max_tokens: Token limit
+
+    Returns:
+        The text, unchanged if it already fits
+    """
+    if max_tokens <= 1:
+        return ""
+    tokenizer = _get_tokenizer()
+    # One token is kept for the trailing ellipsis
+    if tokenizer is not None:
+        encoding = tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        cut = encoding.offsets[max_tokens - 2][1]
+    else:
+        if len(text) <= int(max_tokens * CONTEXT_CHARS_PER_TOKEN):
+            return text
+        cut = int((max_tokens - 1) * CONTEXT_CHARS_PER_TOKEN)
+
+    truncated = text[:cut]
+    boundary = truncated.rfind(" ")
+    if boundary > cut // 2:
+        truncated = truncated[:boundary]
+    return truncated.rstrip() + " ..."
+
+
+def pack_context(
+    items: List[str],
+    budget: int,
+    separator: str = "\n\n",
+    min_item_tokens: int = CONTEXT_MIN_ITEM_TOKENS
+) -> List[Tuple[int, str]]:
+    """
+    Fill a token budget with context items taken in relevance order
+
+    Whole items are added while they fit. The first item that does not fit is
+    trimmed to the remaining budget, unless less than min_item_tokens would remain,
+    and everything after it is dropped.
+
+    Args:
+        items: Context items, most relevant first
+        budget: Token budget for the joined items
+        separator: String the caller joins items with (counted against the budget)
+        min_item_tokens: Smallest useful trimmed item
+
+    Returns:
+        List of (position in items, possibly trimmed text) for the items kept
+    """
+    packed = []
+    remaining = budget
+    separator_tokens = count_tokens(separator) if separator else 0
+    for position, item in enumerate(items):
+        item = compact_whitespace(item)
+        if not item:
+            continue
+        cost = count_tokens(item) + (separator_tokens if packed else 0)
+        if cost <= remaining:
+            packed.append((position, item))
+            remaining -= cost
+            continue
+        available = remaining - (separator_tokens if packed else 0)
+        if available >= min_item_tokens:
+            packed.append((position, truncate_to_tokens(item, available)))
+        break
+
+    if len(packed) < len(items):
+        logger.info(f"Packed {len(packed)} of {len(items)} context items into a {budget}-token budget")
+    return packed
+
+
+def pack_text(text: Optional[str], budget: int) -> str:
+    """Fit a single document (e.g. a CV) into a token budget"""
+    if not text:
+        return ""
+    text = compact_whitespace(text)
+    packed = truncate_to_tokens(text, budget)
+    if packed is not text:
+        logger.info(f"Trimmed a {count_tokens(text)}-token text to a {budget}-token budget")
+    return packed
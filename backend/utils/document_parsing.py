@@ -0,0 +1,63 @@
+import os
+import logging
+from typing import List
+from langchain_community.document_loaders import (
+    PyPDFLoader,
+    Docx2txtLoader,
+    UnstructuredPowerPointLoader
+)
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Kept free of services and models: process-pool workers import this module to parse uploads
+DOCUMENT_CHUNK_SIZE = 1000
+DOCUMENT_CHUNK_OVERLAP = 200
+
+
+def get_loader_for_file(file_path: str):
+    """Get the appropriate loader based on file extension"""
+    file_extension = os.path.splitext(file_path)[1].lower()
+
+    if file_extension == '.pdf':
+        return PyPDFLoader(file_path)
+    elif file_extension in ['.docx', '.doc']:
+        return Docx2txtLoader(file_path)
+    elif file_extension in ['.ppt', '.pptx']:
+        return UnstructuredPowerPointLoader(file_path)
+    else:
+        raise ValueError(f"Unsupported file extension: {file_extension}")
+
+
+def load_and_split(file_path: str, filename: str, session_id: str) -> List[Document]:
+    """
+    Load an uploaded file and split it into chunks tagged with its session
+
+    Args:
+        file_path: Path of the file on disk
+        filename: Name the user uploaded it under
+        session_id: Session the chunks belong to
+
+    Returns:
+        The chunks, empty if nothing could be extracted
+    """
+    documents = get_loader_for_file(file_path).load()
+
+    if not documents:
+        logger.warning(f"No documents loaded from file {filename}")
+        return []
+
+    logger.info(f"Loaded {len(documents)} document pages from {filename}")
+
+    # Add session metadata to each document
+    for doc in documents:
+        if not hasattr(doc, 'metadata'):
+            doc.metadata = {}
+        doc.metadata['session_id'] = session_id
+        doc.metadata['filename'] = filename
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=DOCUMENT_CHUNK_SIZE, chunk_overlap=DOCUMENT_CHUNK_OVERLAP)
+    splits = splitter.split_documents(documents)
+    logger.info(f"Created {len(splits)} chunks from {filename}")
+    return splits
@@ -0,0 +1,118 @@
+import queue
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that coalesces concurrent query embeddings into batches.
+
+    Queries are queued for a background worker thread, which waits up to
+    ``max_wait_ms`` for more queries (or until ``max_batch_size`` are queued),
+    embeds them in one forward pass and resolves each caller's future.
+    Document batches are already batched and go straight to the model.
+    """
+
+    def __init__(self, underlying: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.underlying = underlying
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use"""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self) -> List[Tuple[str, Future]]:
+        """Block for the first request, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Worker loop: embed each collected batch with a single model call"""
+        while True:
+            try:
+                self._embed_batch(self._collect_batch())
+            except Exception as e:
+                # Never let the worker die; queued and future callers depend on it
+                logger.error(f"Embedding batch worker error: {str(e)}")
+
+    def _embed_batch(self, batch: List[Tuple[str, Future]]):
+        """Embed one batch and resolve the futures of callers still waiting"""
+        # Callers that gave up (e.g. a cancelled await) are dropped before the model call
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            vectors = self.underlying.embed_documents([text for text, _ in batch])
+            error = None
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(batch)} queries: {str(e)}")
+            vectors, error = [None] * len(batch), e
+        for (_, future), vector in zip(batch, vectors):
+            try:
+                if error is None:
+                    future.set_result(vector)
+                else:
+                    future.set_exception(error)
+            except Exception as e:
+                logger.warning(f"Could not resolve an embedding request: {str(e)}")
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(batch)
+
+    def submit(self, text: str) -> Future:
+        """Queue a query for embedding and return a future for its vector"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents directly, they are already batched by the caller"""
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query as part of the next batch, blocking until it is ready"""
+        return self.submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query as part of the next batch without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self) -> Dict:
+        """Batch counters"""
+        with self._stats_lock:
+            batches, requests = self.batches, self.requests
+        return {
+            "batches": batches,
+            "requests": requests,
+            "average_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "queued": self._queue.qsize()
+        }
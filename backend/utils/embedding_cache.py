@@ -0,0 +1,257 @@
+import os
+import json
+import fcntl
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "embedding_cache")
+
+
+def text_hash(text: str) -> str:
+    """Content hash used as the cache key for a piece of text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only on-disk tier for cached embeddings.
+
+    Vectors are appended as raw float32 rows to ``vectors.f32`` and read back
+    through ``np.memmap``, so lookups only touch the pages they need. ``keys.tsv``
+    maps each text hash to its row, and ``meta.json`` records the vector dimension;
+    a store written with another dimension (e.g. by a different model variant under
+    the same name) is discarded on open. Writers take an exclusive file lock so
+    several workers can share the same directory.
+    """
+
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.keys_path = os.path.join(directory, "keys.tsv")
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, "lock")
+        self.rows: Dict[str, int] = {}
+        self.dim = dim
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with other workers using the directory"""
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        """Read the key file written by earlier runs, after checking its dimension"""
+        with self._file_lock():
+            stored_dim = None
+            if os.path.exists(self.meta_path):
+                with open(self.meta_path) as f:
+                    stored_dim = json.load(f).get("dim")
+            if stored_dim != self.dim:
+                if stored_dim is not None:
+                    logger.warning(f"Discarding embedding cache in {self.directory}: it holds {stored_dim}-dimensional vectors, the model produces {self.dim}")
+                for path in (self.keys_path, self.vectors_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            elif os.path.exists(self.keys_path):
+                with open(self.keys_path) as f:
+                    for line in f:
+                        parts = line.rstrip("\n").split("\t")
+                        if len(parts) == 2:
+                            self.rows[parts[0]] = int(parts[1])
+        logger.info(f"Loaded {len(self.rows)} cached embeddings from {self.directory}")
+
+    def _vectors(self, min_rows: int) -> Optional[np.memmap]:
+        """Return a memmap covering at least ``min_rows`` rows, remapping after appends"""
+        if self._mmap is None or self._mmap.shape[0] < min_rows:
+            if not os.path.exists(self.vectors_path):
+                return None
+            rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+            if rows == 0:
+                return None
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._mmap
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Look up a vector by text hash"""
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        with self._lock:
+            vectors = self._vectors(row + 1)
+            if vectors is None or row >= vectors.shape[0]:
+                return None
+            return np.array(vectors[row])
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]):
+        """Append vectors that are not stored yet"""
+        items = [(key, vector) for key, vector in items if key not in self.rows]
+        if not items:
+            return
+        block = np.stack([vector for _, vector in items]).astype(np.float32)
+        if block.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {block.shape[1]}")
+
+        with self._lock, self._file_lock():
+            with open(self.vectors_path, "ab") as vectors_file:
+                first_row = vectors_file.tell() // (self.dim * 4)
+                vectors_file.write(block.tobytes())
+            lines = []
+            for offset, (key, _) in enumerate(items):
+                self.rows[key] = first_row + offset
+                lines.append(f"{key}\t{first_row + offset}\n")
+            with open(self.keys_path, "a") as keys_file:
+                keys_file.write("".join(lines))
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches vectors by (model name, content hash).
+
+    Lookups go through an in-memory LRU tier first, then the on-disk tier. Only
+    texts missing from both are sent to the underlying model, in one batch. Query
+    vectors are kept in memory only: the disk tier holds document embeddings, so it
+    grows with the corpus rather than with query traffic, and raw queries are never
+    persisted.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        max_memory_entries: int = 10000,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_memory_entries = max_memory_entries
+        self.memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.disk = None
+        if cache_dir:
+            # One probe embedding tells whether vectors cached on disk still fit the model
+            dim = len(underlying.embed_documents(["embedding dimension probe"])[0])
+            self.disk = DiskEmbeddingStore(os.path.join(cache_dir, model_name.replace("/", "__")), dim)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert into the memory tier, evicting the least recently used entries"""
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        """Look a key up in the memory tier, then the disk tier"""
+        with self._lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, vector)
+                return vector
+        return None
+
+    def _store(self, items: List[Tuple[str, np.ndarray]], persist: bool = True):
+        """Write freshly computed vectors to the memory tier, and to disk if persist"""
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+        if persist and self.disk is not None:
+            try:
+                self.disk.put_many(items)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error writing embedding cache to disk: {str(e)}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, computing only the texts that are not cached"""
+        keys = [text_hash(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self._lookup(key)
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            computed = self.underlying.embed_documents(list(missing.values()))
+            new_items = [
+                (key, np.asarray(vector, dtype=np.float32))
+                for key, vector in zip(missing.keys(), computed)
+            ]
+            self._store(new_items)
+            vectors.update(new_items)
+
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing a cached vector when available"""
+        key = text_hash(text)
+        vector = self._lookup(key)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+            vector = np.asarray(self.underlying.embed_query(text), dtype=np.float32)
+            self._store([(key, vector)], persist=False)
+        return vector.tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query without blocking the event loop on a cache miss"""
+        key = text_hash(text)
+        vector = self._lookup(key)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+            vector = np.asarray(await self.underlying.aembed_query(text), dtype=np.float32)
+            self._store([(key, vector)], persist=False)
+        return vector.tolist()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0
+        }
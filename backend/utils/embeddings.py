@@ -1,19 +1,222 @@
 import os
-from typing import List
+import logging
+import threading
+from typing import Dict, List, Tuple, Union
 import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from dotenv import load_dotenv
 
+from utils.embedding_cache import CachedEmbeddings, DEFAULT_CACHE_DIR
+from utils.embedding_batcher import BatchingEmbeddings
+from utils.onnx_embeddings import OnnxEmbeddings, DEFAULT_ONNX_DIR
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Embedding backend settings ("torch" or "onnx")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", DEFAULT_ONNX_DIR)
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "true").lower() == "true"
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+
+# Embedding cache settings
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_CACHE_DIR)
+EMBEDDING_CACHE_DISK = os.getenv("EMBEDDING_CACHE_DISK", "true").lower() == "true"
+
+# Query micro-batching settings
+EMBEDDING_BATCHING_ENABLED = os.getenv("EMBEDDING_BATCHING_ENABLED", "true").lower() == "true"
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+# Corpus rows scored per BLAS call in top_k_similarities
+SIMILARITY_CHUNK_SIZE = int(os.getenv("SIMILARITY_CHUNK_SIZE", "16384"))
+
+Matrix = Union[np.ndarray, List[List[float]]]
+
+
+class EmbeddingsRegistry:
+    """Process-wide registry handing out one shared embeddings model per model name"""
+
+    def __init__(self):
+        self.models: Dict[str, Embeddings] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_model_name(model_name: str) -> str:
+        """Map short sentence-transformers names onto their hub id so aliases share an instance"""
+        if "/" not in model_name:
+            return f"sentence-transformers/{model_name}"
+        return model_name
+
+    def _load_backend(self, model_name: str) -> Embeddings:
+        """Load the configured inference backend for a model"""
+        if EMBEDDING_BACKEND == "onnx":
+            try:
+                return OnnxEmbeddings(
+                    model_name,
+                    cache_dir=EMBEDDING_ONNX_DIR,
+                    quantize=EMBEDDING_ONNX_QUANTIZE,
+                    num_threads=EMBEDDING_ONNX_THREADS
+                )
+            except Exception as e:
+                logger.error(f"Error loading ONNX embeddings for {model_name}, falling back to torch: {str(e)}")
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    def _load_model(self, model_name: str) -> Embeddings:
+        """Load the embeddings model (called at most once per model name)"""
+        model = self._load_backend(model_name)
+        # ONNX vectors differ slightly from torch ones, so they get their own cache namespace
+        cache_name = model_name
+        if isinstance(model, OnnxEmbeddings):
+            cache_name = f"{model_name}@onnx-{'int8' if EMBEDDING_ONNX_QUANTIZE else 'fp32'}"
+        if EMBEDDING_BATCHING_ENABLED:
+            model = BatchingEmbeddings(
+                model,
+                max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS
+            )
+        if EMBEDDING_CACHE_ENABLED:
+            model = CachedEmbeddings(
+                model,
+                cache_name,
+                max_memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES,
+                cache_dir=EMBEDDING_CACHE_DIR if EMBEDDING_CACHE_DISK else None
+            )
+        return model
+
+    def get(self, model_name: str = DEFAULT_EMBEDDING_MODEL) -> Embeddings:
+        """
+        Get the shared embeddings instance for a model, loading it on first use.
+
+        Args:
+            model_name: Hugging Face model id (short sentence-transformers names are accepted)
+
+        Returns:
+            The shared embeddings instance
+        """
+        key = self.normalize_model_name(model_name)
+        model = self.models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Another thread may have loaded the model while we waited for the lock
+            model = self.models.get(key)
+            if model is None:
+                logger.info(f"Loading embeddings model: {key}")
+                model = self._load_model(key)
+                self.models[key] = model
+        return model
+
+    def loaded_models(self) -> List[str]:
+        """Names of the models that have been loaded so far"""
+        return list(self.models.keys())
+
+    def cache_stats(self) -> List[Dict]:
+        """Embedding cache counters for every loaded model"""
+        return [model.stats() for model in self.models.values() if isinstance(model, CachedEmbeddings)]
+
+    def batcher_stats(self) -> Dict[str, Dict]:
+        """Query batching counters for every loaded model"""
+        stats = {}
+        for name, model in self.models.items():
+            if isinstance(model, CachedEmbeddings):
+                model = model.underlying
+            if isinstance(model, BatchingEmbeddings):
+                stats[name] = model.stats()
+        return stats
+
+
+# Global embeddings registry shared by every service
+embeddings_registry = EmbeddingsRegistry()
+
+
+def get_embeddings(model_name: str = DEFAULT_EMBEDDING_MODEL) -> Embeddings:
+    """Get the shared embeddings instance for a model"""
+    return embeddings_registry.get(model_name)
+
+
+def normalize_rows(matrix: Matrix) -> np.ndarray:
+    """
+    Convert embeddings to a float32 matrix with unit-length rows.
+
+    Args:
+        matrix: Embeddings, one per row
+
+    Returns:
+        Normalized float32 matrix (zero rows stay zero)
+    """
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_similarities(
+    queries: np.ndarray,
+    corpus: np.ndarray,
+    k: int,
+    chunk_size: int = SIMILARITY_CHUNK_SIZE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the k most similar corpus rows for every query row.
+
+    Both matrices must be float32 with normalized rows (see ``normalize_rows``), so a
+    single matrix product gives cosine similarities. The corpus is scored in chunks of
+    ``chunk_size`` rows and only the running top-k is kept, so memory stays at
+    O(queries * (chunk_size + k)) however large the corpus is.
+
+    Args:
+        queries: (m, d) query matrix
+        corpus: (n, d) corpus matrix
+        k: Number of results per query
+        chunk_size: Corpus rows scored per matrix product
+
+    Returns:
+        Tuple of (m, k) corpus indices and (m, k) scores, best first
+    """
+    n = corpus.shape[0]
+    k = min(k, n)
+    m = queries.shape[0]
+    if k <= 0 or m == 0:
+        return np.empty((m, 0), dtype=np.int64), np.empty((m, 0), dtype=np.float32)
+
+    best_scores = np.full((m, 0), -np.inf, dtype=np.float32)
+    best_indices = np.empty((m, 0), dtype=np.int64)
+    rows = np.arange(m)[:, None]
+
+    for start in range(0, n, chunk_size):
+        scores = queries @ corpus[start:start + chunk_size].T
+        if scores.shape[1] > k:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = scores[rows, candidates]
+        else:
+            candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_indices = np.concatenate([best_indices, candidates + start], axis=1)
+        if merged_scores.shape[1] > k:
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            merged_scores = merged_scores[rows, keep]
+            merged_indices = merged_indices[rows, keep]
+        best_scores, best_indices = merged_scores, merged_indices
+
+    order = np.argsort(-best_scores, axis=1)
+    return best_indices[rows, order], best_scores[rows, order]
+
+
 class EmbeddingsUtil:
     """Utility class for working with text embeddings."""
     
     def __init__(self):
         """Initialize the embeddings model."""
-        self.model = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2"
-        )
+        self.model = get_embeddings("all-MiniLM-L6-v2")
     
     def get_text_embedding(self, text: str) -> List[float]:
         """
@@ -63,4 +266,31 @@ class EmbeddingsUtil:
         if norm_vec1 == 0 or norm_vec2 == 0:
             return 0
             
-        return dot_product / (norm_vec1 * norm_vec2)
\ No newline at end of file
+        return dot_product / (norm_vec1 * norm_vec2)
+
+    def compute_similarity_matrix(self, queries: Matrix, corpus: Matrix) -> np.ndarray:
+        """
+        Compute cosine similarities between every query and every corpus embedding.
+        
+        Args:
+            queries: Query embeddings, one per row
+            corpus: Corpus embeddings, one per row
+            
+        Returns:
+            (len(queries), len(corpus)) similarity matrix
+        """
+        return normalize_rows(queries) @ normalize_rows(corpus).T
+    
+    def top_k(self, queries: Matrix, corpus: Matrix, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most similar corpus embeddings for every query.
+        
+        Args:
+            queries: Query embeddings, one per row
+            corpus: Corpus embeddings, one per row
+            k: Number of results per query
+            
+        Returns:
+            Tuple of corpus indices and similarity scores per query, best first
+        """
+        return top_k_similarities(normalize_rows(queries), normalize_rows(corpus), k)
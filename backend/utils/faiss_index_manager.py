@@ -0,0 +1,98 @@
+import os
+import math
+import logging
+from typing import Optional
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+# Index type to migrate to once a store crosses FAISS_UPGRADE_THRESHOLD vectors:
+# "flat" keeps exact search forever, "ivf" or "hnsw" switch to approximate search
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "ivf").lower()
+FAISS_UPGRADE_THRESHOLD = int(os.getenv("FAISS_UPGRADE_THRESHOLD", "50000"))
+
+# IVF settings: nlist of 0 picks 4 * sqrt(n); nprobe trades recall for latency
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+
+# HNSW settings: efSearch trades recall for latency
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "80"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+
+
+def apply_search_params(index: faiss.Index):
+    """Apply the configured nprobe/efSearch to an approximate index"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = FAISS_EF_SEARCH
+        return
+    try:
+        faiss.extract_index_ivf(index).nprobe = FAISS_NPROBE
+    except RuntimeError:
+        # Not an IVF index, nothing to tune
+        pass
+
+
+def build_ann_index(vectors: np.ndarray, metric_type: int, index_type: Optional[str] = None) -> faiss.Index:
+    """
+    Build an approximate index over existing vectors, keeping their order.
+
+    Args:
+        vectors: (n, d) float32 vectors in the order of the current index
+        metric_type: FAISS metric of the current index
+        index_type: "ivf" or "hnsw" (defaults to FAISS_INDEX_TYPE)
+
+    Returns:
+        The populated index
+    """
+    n, d = vectors.shape
+    index_type = index_type or FAISS_INDEX_TYPE
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, FAISS_HNSW_M, metric_type)
+        index.hnsw.efConstruction = FAISS_EF_CONSTRUCTION
+    else:
+        # k-means wants at least ~39 training points per centroid
+        nlist = FAISS_IVF_NLIST or max(1, min(int(4 * math.sqrt(n)), n // 39))
+        if metric_type == faiss.METRIC_INNER_PRODUCT:
+            quantizer = faiss.IndexFlatIP(d)
+        else:
+            quantizer = faiss.IndexFlatL2(d)
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, metric_type)
+        # 64 points per centroid is plenty for k-means and keeps training fast
+        sample_size = min(n, nlist * 64)
+        sample = vectors[np.random.default_rng(0).choice(n, sample_size, replace=False)]
+        index.train(sample)
+
+    index.add(vectors)
+    apply_search_params(index)
+    return index
+
+
+def maybe_upgrade_index(vector_store: FAISS) -> bool:
+    """
+    Migrate a flat store to an IVF or HNSW index once it crosses the size threshold.
+
+    Vectors keep their positions, so the store's index_to_docstore_id mapping stays
+    valid and similarity_search callers are unaffected. Already-approximate indexes
+    just get the configured search parameters applied.
+
+    Args:
+        vector_store: The langchain FAISS store to check
+
+    Returns:
+        True if the index was migrated
+    """
+    index = vector_store.index
+    if not isinstance(index, faiss.IndexFlat):
+        apply_search_params(index)
+        return False
+    if FAISS_INDEX_TYPE not in ("ivf", "hnsw") or index.ntotal < FAISS_UPGRADE_THRESHOLD:
+        return False
+
+    logger.info(f"Migrating flat index with {index.ntotal} vectors to {FAISS_INDEX_TYPE}")
+    vectors = index.reconstruct_n(0, index.ntotal)
+    vector_store.index = build_ann_index(vectors, index.metric_type)
+    logger.info(f"Migrated index to {FAISS_INDEX_TYPE}")
+    return True
@@ -0,0 +1,350 @@
+import os
+import json
+import fcntl
+import base64
+import shutil
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+from utils.faiss_storage import load_faiss_store, save_faiss_store, writable_index
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalFaissStore:
+    """
+    Persists a FAISS vector store as a full snapshot plus an append-only delta log.
+
+    Each ingestion batch appends one record (ids, texts, metadata and vectors) to
+    ``deltas.jsonl``, so write cost depends on the batch size rather than the index
+    size. Once enough deltas pile up (needs_compaction), the owner writes a new
+    snapshot with compact() and the deltas it covers are dropped from the log. On
+    startup the latest snapshot is loaded and newer deltas are replayed without
+    re-embedding anything.
+
+    Layout of ``index_path``::
+
+        CURRENT              name of the live snapshot directory
+        snapshot-<seq>/      save_faiss_store output, covers deltas up to <seq>
+        deltas.jsonl         delta records with seq > the snapshot's seq (and the
+                             last compact_every it covers, which load() skips)
+        lock                 file lock held by writers
+
+    A legacy ``index.faiss``/``index.pkl`` pair directly in ``index_path`` is
+    loaded as the snapshot when no CURRENT file exists; pickled snapshots from
+    before the memory-mappable layout load too.
+
+    Several processes (e.g. uvicorn workers) may share ``index_path``. Writers
+    hold locked(), an exclusive file lock, and first apply what the others logged
+    (read_new_deltas and replay), so delta seqs stay one global sequence and a
+    snapshot at seq N covers every record up to N whoever wrote it.
+    """
+
+    def __init__(self, index_path: str, embeddings: Embeddings, compact_every: int = 50):
+        self.index_path = index_path
+        self.embeddings = embeddings
+        self.compact_every = compact_every
+        self.current_path = os.path.join(index_path, "CURRENT")
+        self.deltas_path = os.path.join(index_path, "deltas.jsonl")
+        self.lock_path = os.path.join(index_path, "lock")
+        self.snapshot_seq = 0
+        self.last_seq = 0
+        self.pending_deltas = 0
+        # (inode, offset, mtime) of deltas.jsonl when records up to offset were applied
+        self._deltas_position: Tuple[int, int, int] = (0, 0, 0)
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        os.makedirs(index_path, exist_ok=True)
+
+    @contextmanager
+    def locked(self):
+        """Hold the store's lock, shared with every process using index_path (reentrant)"""
+        with self._lock:
+            if self._lock_depth == 0:
+                self._lock_file = open(self.lock_path, "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    @property
+    def published_seq(self) -> Optional[int]:
+        """Seq of the snapshot CURRENT names, or None if there is none"""
+        if not os.path.exists(self.current_path):
+            return None
+        with open(self.current_path) as f:
+            return int(f.read().strip().rsplit("-", 1)[1])
+
+    def _snapshot_dir(self) -> Optional[str]:
+        """Directory of the live snapshot, or None if nothing has been saved yet"""
+        if os.path.exists(self.current_path):
+            self.snapshot_seq = self.published_seq
+            return os.path.join(self.index_path, f"snapshot-{self.snapshot_seq:08d}")
+        if os.path.exists(os.path.join(self.index_path, "index.faiss")):
+            return self.index_path
+        return None
+
+    def _read_deltas(self, offset: int = 0, repair: bool = False) -> Tuple[List[Dict], int]:
+        """
+        Read delta records from a byte offset on
+
+        A torn trailing line from an interrupted write is skipped; with repair it is
+        also truncated away, so the next append starts on a line of its own.
+
+        Returns:
+            Tuple of (records, offset just past the last complete line)
+        """
+        records = []
+        if not os.path.exists(self.deltas_path):
+            return records, 0
+        good_offset = offset
+        torn = False
+        with open(self.deltas_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                    good_offset += len(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    if line.endswith(b"\n"):
+                        logger.warning(f"Skipping corrupt delta record in {self.deltas_path}")
+                        good_offset += len(line)
+                    else:
+                        torn = True
+        if torn and repair:
+            logger.warning(f"Truncating torn delta record at offset {good_offset} of {self.deltas_path}")
+            with open(self.deltas_path, "r+b") as f:
+                f.truncate(good_offset)
+                os.fsync(f.fileno())
+        return records, good_offset
+
+    def _remember_position(self, offset: int):
+        """Record that deltas.jsonl, as it is now, has been applied up to offset"""
+        if os.path.exists(self.deltas_path):
+            stat = os.stat(self.deltas_path)
+            self._deltas_position = (stat.st_ino, offset, stat.st_mtime_ns)
+        else:
+            self._deltas_position = (0, 0, 0)
+
+    def load(self) -> Optional[FAISS]:
+        """
+        Load the latest snapshot and replay newer deltas.
+
+        Returns:
+            The vector store, or None if there is nothing on disk
+        """
+        with self.locked():
+            snapshot_dir = self._snapshot_dir()
+            if snapshot_dir is None:
+                return None
+
+            vector_store = load_faiss_store(snapshot_dir, self.embeddings)
+            self.last_seq = self.snapshot_seq
+
+            records, offset = self._read_deltas(repair=True)
+            records = [record for record in records if record["seq"] > self.snapshot_seq]
+            if records:
+                # A memory-mapped index is read-only; replay into a heap copy
+                # (the next compaction brings back the shared mapping)
+                vector_store.index = writable_index(vector_store.index)
+                self.replay(vector_store, records)
+            self.pending_deltas = len(records)
+            self._remember_position(offset)
+        logger.info(f"Loaded snapshot {snapshot_dir} and replayed {len(records)} delta batches")
+        return vector_store
+
+    def changed_on_disk(self) -> bool:
+        """Whether another process has written to the log since this one last read it (one stat call)"""
+        try:
+            stat = os.stat(self.deltas_path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns) != self._deltas_position
+
+    def read_new_deltas(self) -> Optional[List[Dict]]:
+        """
+        Records other processes logged since this one last read or wrote the log
+
+        Call with locked() held and pass the records to replay() before appending.
+
+        Returns:
+            The records in seq order, or None if some of them are gone (another
+            process compacted them into a snapshot), in which case load() again
+        """
+        with self.locked():
+            records = []
+            if self.changed_on_disk():
+                inode, offset, _ = self._deltas_position
+                stat = os.stat(self.deltas_path)
+                records, end = [], 0
+                if stat.st_ino == inode and stat.st_size > offset:
+                    # Usually appends since the last read; a compaction's rewrite may
+                    # reuse the inode though, so the records must follow on by seq
+                    records, end = self._read_deltas(offset)
+                if not records or records[0]["seq"] != self.last_seq + 1:
+                    records, end = self._read_deltas()
+                self._remember_position(end)
+                records = [record for record in records if record["seq"] > self.last_seq]
+            if records:
+                return records if records[0]["seq"] == self.last_seq + 1 else None
+            current_seq = self.published_seq
+            return None if current_seq is not None and current_seq > self.last_seq else []
+
+    def replay(self, vector_store: FAISS, records: List[Dict]) -> List[str]:
+        """
+        Add logged records to a store without re-embedding them
+
+        Returns:
+            Docstore ids of the added documents
+        """
+        ids = []
+        for record in records:
+            vectors = np.frombuffer(base64.b64decode(record["vectors"]), dtype=np.float32)
+            vectors = vectors.reshape(len(record["texts"]), -1)
+            vector_store.add_embeddings(
+                list(zip(record["texts"], vectors.tolist())),
+                metadatas=record["metadatas"],
+                ids=record["ids"]
+            )
+            ids.extend(record["ids"])
+            self.last_seq = record["seq"]
+        self.pending_deltas += len(records)
+        return ids
+
+    def append(
+        self,
+        vector_store: FAISS,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: List[Dict]
+    ) -> List[str]:
+        """
+        Add pre-computed embeddings to the store and log them as one delta record.
+
+        When other processes share index_path, hold locked() and apply
+        read_new_deltas() first, so the record gets the next global seq.
+
+        Returns:
+            Docstore ids of the added documents; the record's seq is last_seq
+        """
+        ids = [str(uuid.uuid4()) for _ in texts]
+        with self.locked():
+            vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+            self.last_seq += 1
+            record = {
+                "seq": self.last_seq,
+                "ids": ids,
+                "texts": texts,
+                "metadatas": metadatas,
+                "vectors": base64.b64encode(np.asarray(vectors, dtype=np.float32).tobytes()).decode("ascii")
+            }
+            with open(self.deltas_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                offset = f.tell()
+            self._remember_position(offset)
+            self.pending_deltas += 1
+        return ids
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.pending_deltas >= self.compact_every
+
+    def compact(self, vector_store: FAISS, seq: Optional[int] = None) -> Optional[str]:
+        """
+        Write a full snapshot of the store and drop the deltas it covers
+
+        The snapshot is written without holding the lock, so appends carry on
+        meanwhile; the lock only covers publishing it and trimming the delta log.
+        A process must not run two compactions at once.
+
+        Args:
+            vector_store: The store, holding every delta up to seq; it must not
+                change while the snapshot is written
+            seq: Last delta record in vector_store (defaults to the last one logged)
+
+        Returns:
+            Directory of the new snapshot, or None if another process published
+            one at least as recent meanwhile
+        """
+        seq = self.last_seq if seq is None else seq
+        name = f"snapshot-{seq:08d}"
+        snapshot_dir = os.path.join(self.index_path, name)
+        # The pid lets other processes tell a live compaction from a crashed one
+        tmp_dir = f"{snapshot_dir}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        save_faiss_store(vector_store, tmp_dir)
+
+        with self.locked():
+            current_seq = self.published_seq
+            if current_seq is not None and current_seq >= seq:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                records, _ = self._read_deltas()
+                self.pending_deltas = sum(1 for record in records if record["seq"] > current_seq)
+                logger.info(f"Skipped compaction at seq {seq}: snapshot {current_seq} is already published")
+                return None
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            os.replace(tmp_dir, snapshot_dir)
+
+            # Publish the snapshot atomically, then drop deltas it covers, except the
+            # last compact_every so processes a few commits behind catch up from the log
+            with open(self.current_path + ".tmp", "w") as f:
+                f.write(name)
+            os.replace(self.current_path + ".tmp", self.current_path)
+            self.snapshot_seq = seq
+            records, _ = self._read_deltas()
+            kept = [record for record in records if record["seq"] > seq - self.compact_every]
+            with open(self.deltas_path + ".tmp", "w") as f:
+                for record in kept:
+                    f.write(json.dumps(record) + "\n")
+                offset = f.tell()
+            os.replace(self.deltas_path + ".tmp", self.deltas_path)
+            self.pending_deltas = sum(1 for record in kept if record["seq"] > seq)
+            if not kept or kept[-1]["seq"] <= self.last_seq:
+                self._remember_position(offset)
+
+            # Older snapshots are never published again, so they can go once listed
+            stale = [
+                entry for entry in os.listdir(self.index_path)
+                if entry.startswith("snapshot-") and entry != name and not self._compacting_elsewhere(entry)
+            ]
+            for legacy_file in ("index.faiss", "index.pkl"):
+                legacy_path = os.path.join(self.index_path, legacy_file)
+                if os.path.exists(legacy_path):
+                    os.remove(legacy_path)
+        for entry in stale:
+            shutil.rmtree(os.path.join(self.index_path, entry), ignore_errors=True)
+        logger.info(f"Compacted index at {self.index_path} into {name}")
+        return snapshot_dir
+
+    @staticmethod
+    def _compacting_elsewhere(entry: str) -> bool:
+        """Whether entry is the temporary directory of a compaction still running in another process"""
+        if not entry.endswith(".tmp"):
+            return False
+        try:
+            pid = int(entry.split(".")[1])
+        except (IndexError, ValueError):
+            return False
+        if pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
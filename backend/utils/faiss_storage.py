@@ -0,0 +1,205 @@
+import os
+import json
+import uuid
+import shutil
+from typing import Dict, List, Optional, Union
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+# Open saved indexes read-only through mmap so uvicorn workers share the OS page
+# cache instead of each holding a private heap copy
+FAISS_MMAP_ENABLED = os.getenv("FAISS_MMAP_ENABLED", "false").lower() == "true"
+# Older FAISS builds lack IO_FLAG_MMAP_IFC (in-place mmap of flat codes)
+FAISS_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+INDEX_FILE = "index.faiss"
+IDS_FILE = "ids.json"
+DOCSTORE_DATA_FILE = "docstore.data"
+DOCSTORE_OFFSETS_FILE = "docstore.offsets.npy"
+META_FILE = "store.json"
+# Names the live generation directory of a saved store
+POINTER_FILE = "CURRENT"
+
+
+class MmapDocstore(Docstore, AddableMixin):
+    """
+    Read-only docstore over a memory-mapped file, plus an in-memory overlay for
+    documents added after loading.
+
+    Each document is stored as a JSON record in ``docstore.data``; record i spans
+    ``offsets[i]:offsets[i + 1]`` and belongs to ``ids[i]``. Only the id -> row map
+    lives on the heap, document payloads are decoded on access.
+    """
+
+    def __init__(self, path: str, ids: List[str]):
+        self.path = path
+        self.rows: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(ids)}
+        self.offsets = np.load(os.path.join(path, DOCSTORE_OFFSETS_FILE), mmap_mode="r")
+        data_path = os.path.join(path, DOCSTORE_DATA_FILE)
+        # np.memmap refuses empty files
+        self.data = np.memmap(data_path, dtype=np.uint8, mode="r") if os.path.getsize(data_path) else np.zeros(0, np.uint8)
+        self.overlay: Dict[str, Document] = {}
+        self.deleted: set = set()
+
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.overlay) - len(self.deleted)
+
+    def _read(self, row: int, doc_id: str) -> Document:
+        record = json.loads(self.data[self.offsets[row]:self.offsets[row + 1]].tobytes())
+        return Document(id=doc_id, page_content=record["page_content"], metadata=record["metadata"])
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self.deleted:
+            return f"ID {search} not found."
+        if search in self.overlay:
+            return self.overlay[search]
+        row = self.rows.get(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self._read(row, search)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        overlapping = set(texts).intersection(self.overlay.keys() | self.rows.keys())
+        if overlapping - self.deleted:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self.overlay.update(texts)
+        self.deleted.difference_update(texts)
+
+    def delete(self, ids: List) -> None:
+        missing = [doc_id for doc_id in ids if doc_id not in self.overlay and doc_id not in self.rows]
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        for doc_id in ids:
+            self.overlay.pop(doc_id, None)
+            if doc_id in self.rows:
+                self.deleted.add(doc_id)
+
+
+def writable_index(index: faiss.Index) -> faiss.Index:
+    """
+    Heap copy of an index that is safe to add to.
+
+    Indexes opened with FAISS_MMAP_FLAGS view the file in place and must never be
+    written; clone_index would keep that view, so round-trip through serialization.
+    """
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+def _live_dir(path: str) -> str:
+    """Directory holding the files of the store saved at path"""
+    pointer = os.path.join(path, POINTER_FILE)
+    if os.path.exists(pointer):
+        with open(pointer) as f:
+            return os.path.join(path, f.read().strip())
+    # Flat layout from before generations were introduced
+    return path
+
+
+def faiss_store_exists(path: str) -> bool:
+    """Whether path holds a store written by save_faiss_store or FAISS.save_local"""
+    return os.path.exists(os.path.join(_live_dir(path), INDEX_FILE))
+
+
+def save_faiss_store(vector_store: FAISS, path: str):
+    """
+    Save a FAISS store with a memory-mappable docstore instead of a pickle
+
+    Every save writes a new generation directory under path and then swaps the
+    CURRENT pointer to it. Files of earlier saves are never rewritten, because
+    stores loaded from them keep the files memory-mapped and would crash on a
+    truncated mapping; they are only unlinked, which leaves open mappings intact.
+    The previous generation is kept for loaders that read CURRENT just before
+    the swap.
+
+    Args:
+        vector_store: The store to save
+        path: Directory to write (created if missing)
+    """
+    os.makedirs(path, exist_ok=True)
+    pointer = os.path.join(path, POINTER_FILE)
+    previous = None
+    if os.path.exists(pointer):
+        with open(pointer) as f:
+            previous = f.read().strip()
+    name = f"store-{uuid.uuid4().hex}"
+    store_dir = os.path.join(path, name)
+    os.makedirs(store_dir)
+
+    try:
+        faiss.write_index(vector_store.index, os.path.join(store_dir, INDEX_FILE))
+
+        ids = [vector_store.index_to_docstore_id[i] for i in range(len(vector_store.index_to_docstore_id))]
+        offsets = np.zeros(len(ids) + 1, dtype=np.uint64)
+        with open(os.path.join(store_dir, DOCSTORE_DATA_FILE), "wb") as f:
+            for row, doc_id in enumerate(ids):
+                doc = vector_store.docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Could not find document for id {doc_id}")
+                record = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, default=str).encode("utf-8")
+                f.write(record)
+                offsets[row + 1] = offsets[row] + len(record)
+        np.save(os.path.join(store_dir, DOCSTORE_OFFSETS_FILE), offsets)
+
+        with open(os.path.join(store_dir, IDS_FILE), "w") as f:
+            json.dump(ids, f)
+        with open(os.path.join(store_dir, META_FILE), "w") as f:
+            json.dump({
+                "distance_strategy": vector_store.distance_strategy.value,
+                "normalize_L2": vector_store._normalize_L2
+            }, f)
+    except BaseException:
+        shutil.rmtree(store_dir, ignore_errors=True)
+        raise
+
+    # Publish the new generation atomically
+    with open(pointer + ".tmp", "w") as f:
+        f.write(name)
+    os.replace(pointer + ".tmp", pointer)
+
+    # Drop older generations and files of the flat layout
+    for entry in os.listdir(path):
+        entry_path = os.path.join(path, entry)
+        if entry.startswith("store-") and entry not in (name, previous):
+            shutil.rmtree(entry_path, ignore_errors=True)
+        elif entry in (INDEX_FILE, IDS_FILE, DOCSTORE_DATA_FILE, DOCSTORE_OFFSETS_FILE, META_FILE, "index.pkl"):
+            os.remove(entry_path)
+
+
+def load_faiss_store(path: str, embeddings: Embeddings, mmap: Optional[bool] = None) -> FAISS:
+    """
+    Load a store written by save_faiss_store, or a legacy FAISS.save_local directory
+
+    Args:
+        path: Directory to load
+        embeddings: Embeddings for queries and new documents
+        mmap: Open the index read-only through mmap (defaults to FAISS_MMAP_ENABLED)
+
+    Returns:
+        The vector store. A memory-mapped index must not be added to; callers that
+        write go through writable_index first.
+    """
+    path = _live_dir(path)
+    if not os.path.exists(os.path.join(path, DOCSTORE_OFFSETS_FILE)):
+        # Legacy layout written by FAISS.save_local by this app, so unpickling is safe
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    mmap = FAISS_MMAP_ENABLED if mmap is None else mmap
+    index = faiss.read_index(os.path.join(path, INDEX_FILE), FAISS_MMAP_FLAGS if mmap else 0)
+    with open(os.path.join(path, IDS_FILE)) as f:
+        ids = json.load(f)
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=MmapDocstore(path, ids),
+        index_to_docstore_id=dict(enumerate(ids)),
+        normalize_L2=meta["normalize_L2"],
+        distance_strategy=DistanceStrategy(meta["distance_strategy"])
+    )
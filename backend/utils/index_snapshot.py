@@ -0,0 +1,156 @@
+import bisect
+from typing import Iterator, Mapping, NamedTuple, Sequence, Tuple, Union
+import faiss
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from utils.lexical_index import BM25Index, BM25View
+from utils.faiss_storage import writable_index
+
+
+class IndexSnapshot(NamedTuple):
+    """
+    One published version of a retrieval index.
+
+    A snapshot is never mutated once published. Its vectors live in segments: a
+    base store plus one small store per commit since the last compaction. Each
+    segment is immutable, so a writer publishes a new version by building a new
+    tuple that shares the existing segments and adds its own, and readers search
+    whatever snapshot they grabbed without locks. The lexical index is a view of
+    a shared append-only BM25 index, cut at the documents of this version.
+    """
+    segments: Tuple[FAISS, ...]
+    # All segments searched as one store
+    vector_store: FAISS
+    lexical_index: BM25View
+    version: int
+    # Last delta log record the segments cover
+    seq: int
+
+
+class LayeredDocstore(Docstore):
+    """Read-only union of the docstores of several segments"""
+
+    def __init__(self, layers: Sequence[Docstore]):
+        flattened = []
+        for layer in layers:
+            flattened.extend(layer.layers if isinstance(layer, LayeredDocstore) else [layer])
+        self.layers = tuple(flattened)
+
+    def search(self, search: str) -> Union[str, Document]:
+        for layer in self.layers:
+            doc = layer.search(search)
+            if isinstance(doc, Document):
+                return doc
+        return f"ID {search} not found."
+
+
+class LayeredIdMap(Mapping):
+    """Index position -> docstore id across segments whose positions follow one another"""
+
+    def __init__(self, maps: Sequence[Mapping]):
+        self.maps = tuple(maps)
+        self.starts = []
+        total = 0
+        for id_map in self.maps:
+            self.starts.append(total)
+            total += len(id_map)
+        self.total = total
+
+    def __getitem__(self, position) -> str:
+        if not 0 <= position < self.total:
+            raise KeyError(position)
+        layer = bisect.bisect_right(self.starts, position) - 1
+        return self.maps[layer][position - self.starts[layer]]
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.total))
+
+
+def segment_view(segments: Sequence[FAISS]) -> FAISS:
+    """
+    One searchable store over segments, oldest first, without copying any of them
+
+    The segments' indexes become shards of an IndexShards whose result ids follow
+    the segment order, so the layered id map resolves them to documents.
+    """
+    first = segments[0]
+    if len(segments) == 1:
+        return first
+    index = faiss.IndexShards(first.index.d, False, True)
+    for segment in segments:
+        index.add_shard(segment.index)
+    return FAISS(
+        embedding_function=first.embedding_function,
+        index=index,
+        docstore=LayeredDocstore([segment.docstore for segment in segments]),
+        index_to_docstore_id=LayeredIdMap([segment.index_to_docstore_id for segment in segments]),
+        relevance_score_fn=first.override_relevance_score_fn,
+        normalize_L2=first._normalize_L2,
+        distance_strategy=first.distance_strategy
+    )
+
+
+def empty_segment(like: FAISS) -> FAISS:
+    """Empty flat store with the dimension, metric and settings of another store"""
+    return FAISS(
+        embedding_function=like.embedding_function,
+        index=faiss.IndexFlat(like.index.d, like.index.metric_type),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        relevance_score_fn=like.override_relevance_score_fn,
+        normalize_L2=like._normalize_L2,
+        distance_strategy=like.distance_strategy
+    )
+
+
+def merge_segments(segments: Sequence[FAISS], copy_documents: bool = True) -> FAISS:
+    """
+    Concatenate segments, oldest first, into one writable store
+
+    The first segment's index is copied as is (it may be approximate); the others
+    must be flat, since their vectors are reconstructed and added to it.
+
+    Args:
+        segments: Segments to merge; they are not modified
+        copy_documents: Copy documents into a new in-memory docstore rather than
+            layering the segments' docstores (which keeps a mapped docstore mapped)
+    """
+    first = segments[0]
+    index = writable_index(first.index)
+    ids = []
+    for segment in segments:
+        if segment is not first and segment.index.ntotal:
+            index.add(segment.index.reconstruct_n(0, segment.index.ntotal))
+        ids.extend(segment.index_to_docstore_id[position] for position in range(len(segment.index_to_docstore_id)))
+
+    if copy_documents:
+        layered = LayeredDocstore([segment.docstore for segment in segments])
+        docstore = InMemoryDocstore({doc_id: layered.search(doc_id) for doc_id in ids})
+    else:
+        docstore = LayeredDocstore([segment.docstore for segment in segments])
+    return FAISS(
+        embedding_function=first.embedding_function,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(ids)),
+        relevance_score_fn=first.override_relevance_score_fn,
+        normalize_L2=first._normalize_L2,
+        distance_strategy=first.distance_strategy
+    )
+
+
+def build_snapshot(segments: Tuple[FAISS, ...], lexical_index: BM25Index, version: int, seq: int) -> IndexSnapshot:
+    """Snapshot of segments and of the documents lexical_index holds right now"""
+    return IndexSnapshot(
+        segments=segments,
+        vector_store=segment_view(segments),
+        lexical_index=lexical_index.view(),
+        version=version,
+        seq=seq
+    )
@@ -0,0 +1,211 @@
+import os
+import re
+import math
+import heapq
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+# Hybrid retrieval settings
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Each retriever fetches k * HYBRID_FETCH_MULTIPLIER candidates before fusion
+HYBRID_FETCH_MULTIPLIER = int(os.getenv("HYBRID_FETCH_MULTIPLIER", "2"))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens (Unicode aware, so Twi letters like ɛ and ɔ are kept)"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Incrementally maintained inverted index with Okapi BM25 scoring.
+
+    Documents are keyed by their vector store docstore id so lexical hits can be
+    fused with dense hits from the same store. The index is append-only: view()
+    publishes the documents added so far, and searching a view ignores documents
+    added after it was taken, so one index can be shared by readers of older
+    versions while a writer keeps adding to it.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        # Position of each document in insertion order, for views
+        self.doc_positions: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, text: str):
+        """Index a document"""
+        if doc_id in self.doc_lengths:
+            return
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        # Lengths and positions first: a concurrent search may meet the postings right away
+        self.doc_positions[doc_id] = len(self.doc_lengths)
+        self.doc_lengths[doc_id] = length
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.total_length += length
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        """Index (doc_id, text) pairs"""
+        for doc_id, text in items:
+            self.add(doc_id, text)
+
+    def view(self) -> "BM25View":
+        """Read-only view of the documents indexed so far"""
+        return BM25View(self, len(self.doc_lengths), self.total_length)
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Score documents against a query.
+
+        Args:
+            query: Query text
+            k: Number of results
+
+        Returns:
+            List of (doc_id, score), best first
+        """
+        return self._search(query, k, len(self.doc_lengths), self.total_length)
+
+    def _search(self, query: str, k: int, n: int, total_length: int) -> List[Tuple[str, float]]:
+        """Score the first n documents, whose lengths sum to total_length"""
+        if n == 0:
+            return []
+        # Documents past n were added after the caller's view; skip them
+        limited = n < len(self.doc_lengths)
+        average_length = total_length / n
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            # list() copies the postings without releasing the GIL, so a concurrent add cannot
+            # change the dict mid-iteration
+            postings = list(postings.items())
+            if limited:
+                postings = [(doc_id, frequency) for doc_id, frequency in postings if self.doc_positions[doc_id] < n]
+                if not postings:
+                    continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    @classmethod
+    def from_vector_store(cls, vector_store: FAISS) -> "BM25Index":
+        """Build an index over every document already in a FAISS store"""
+        index = cls()
+        for doc_id in vector_store.index_to_docstore_id.values():
+            doc = vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                # Docstores pickled by older langchain versions lack ids; fusion needs them
+                if doc.id is None:
+                    doc.id = doc_id
+                index.add(doc_id, doc.page_content)
+        return index
+
+
+class BM25View(NamedTuple):
+    """A BM25Index as of the moment view() was called"""
+    index: BM25Index
+    size: int
+    total_length: int
+
+    def __len__(self) -> int:
+        return self.size
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Score the documents of this view against a query, best first"""
+        return self.index._search(query, k, self.size, self.total_length)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = HYBRID_RRF_K) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists with reciprocal-rank fusion.
+
+    Args:
+        rankings: Ranked lists of ids, best first
+        k: RRF damping constant
+
+    Returns:
+        List of (id, fused score), best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _fuse(
+    vector_store: FAISS,
+    dense_docs: List[Document],
+    lexical_hits: List[Tuple[str, float]],
+    k: int
+) -> List[Document]:
+    """Fuse dense and lexical results and resolve the winning ids to documents"""
+    docs_by_id = {doc.id: doc for doc in dense_docs if doc.id is not None}
+    fused = reciprocal_rank_fusion([[doc.id for doc in dense_docs], [doc_id for doc_id, _ in lexical_hits]])
+
+    results = []
+    for doc_id, _ in fused[:k]:
+        doc = docs_by_id.get(doc_id) or vector_store.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            results.append(doc)
+    return results
+
+
+def hybrid_search(
+    vector_store: FAISS,
+    lexical_index: Optional[Union[BM25Index, BM25View]],
+    query: str,
+    k: int = 4
+) -> List[Document]:
+    """
+    Retrieve documents with dense search and BM25, fused with reciprocal-rank fusion.
+
+    Falls back to plain dense search when hybrid search is disabled or no lexical
+    index is available.
+    """
+    if not HYBRID_SEARCH_ENABLED or lexical_index is None or len(lexical_index) == 0:
+        return vector_store.similarity_search(query, k=k)
+
+    fetch_k = k * HYBRID_FETCH_MULTIPLIER
+    dense_docs = vector_store.similarity_search(query, k=fetch_k)
+    lexical_hits = lexical_index.search(query, fetch_k)
+    return _fuse(vector_store, dense_docs, lexical_hits, k)
+
+
+async def ahybrid_search(
+    vector_store: FAISS,
+    lexical_index: Optional[Union[BM25Index, BM25View]],
+    query: str,
+    k: int = 4
+) -> List[Document]:
+    """Async hybrid_search: the dense and lexical retrievers run concurrently"""
+    if not HYBRID_SEARCH_ENABLED or lexical_index is None or len(lexical_index) == 0:
+        return await vector_store.asimilarity_search(query, k=k)
+
+    fetch_k = k * HYBRID_FETCH_MULTIPLIER
+    dense_docs, lexical_hits = await asyncio.gather(
+        vector_store.asimilarity_search(query, k=fetch_k),
+        asyncio.to_thread(lexical_index.search, query, fetch_k)
+    )
+    return _fuse(vector_store, dense_docs, lexical_hits, k)
@@ -0,0 +1,109 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+import httpx
+from langchain_groq import ChatGroq
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM_MODEL = "llama3-70b-8192"
+
+# Groq endpoint; point it at a Groq-compatible server (e.g. for load tests)
+GROQ_API_BASE = os.getenv("GROQ_API_BASE") or None
+# Connection pool shared by every Groq client in the process
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+GROQ_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "20"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30"))
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+
+
+class LLMRegistry:
+    """
+    Process-wide registry handing out one shared ChatGroq client per
+    (model, temperature, API key).
+
+    All clients share a pair of pooled httpx clients, so keep-alive connections
+    (and their TLS sessions) are reused across requests and services instead of
+    being set up for every question.
+    """
+
+    def __init__(self):
+        self.models: Dict[Tuple[str, float, str], ChatGroq] = {}
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+
+    def _http_clients(self) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """Create the pooled HTTP clients on first use (caller holds the lock)"""
+        if self._http_client is None:
+            limits = httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GROQ_KEEPALIVE_EXPIRY
+            )
+            timeout = httpx.Timeout(GROQ_TIMEOUT)
+            self._http_client = httpx.Client(limits=limits, timeout=timeout)
+            self._http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        return self._http_client, self._http_async_client
+
+    def get(
+        self,
+        api_key: Optional[str] = None,
+        model_name: str = DEFAULT_LLM_MODEL,
+        temperature: float = 0.7
+    ) -> ChatGroq:
+        """
+        Get the shared client for a model and temperature, creating it on first use.
+
+        Args:
+            api_key: Groq API key (defaults to GROQ_API_KEY)
+            model_name: Groq model id
+            temperature: Sampling temperature
+
+        Returns:
+            The shared ChatGroq client
+        """
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        key = (model_name, temperature, api_key or "")
+        llm = self.models.get(key)
+        if llm is not None:
+            return llm
+
+        with self._lock:
+            # Another thread may have created the client while we waited for the lock
+            llm = self.models.get(key)
+            if llm is None:
+                logger.info(f"Creating Groq client for {model_name} (temperature {temperature})")
+                http_client, http_async_client = self._http_clients()
+                llm = ChatGroq(
+                    api_key=api_key,
+                    model_name=model_name,
+                    temperature=temperature,
+                    base_url=GROQ_API_BASE,
+                    timeout=GROQ_TIMEOUT,
+                    http_client=http_client,
+                    http_async_client=http_async_client
+                )
+                self.models[key] = llm
+        return llm
+
+    def loaded_models(self) -> List[Dict]:
+        """(model, temperature) pairs that have a client"""
+        return [{"model": model, "temperature": temperature} for model, temperature, _ in self.models]
+
+
+# Global LLM registry shared by every service
+llm_registry = LLMRegistry()
+
+
+def get_llm(
+    api_key: Optional[str] = None,
+    model_name: str = DEFAULT_LLM_MODEL,
+    temperature: float = 0.7
+) -> ChatGroq:
+    """Get the shared ChatGroq client for a model and temperature"""
+    return llm_registry.get(api_key, model_name, temperature)
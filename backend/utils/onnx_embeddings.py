@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import inspect
+import logging
+import tempfile
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ONNX_DIR = os.path.join(tempfile.gettempdir(), "onnx_embeddings")
+
+# Max sequence lengths used by the sentence-transformers configs of the models we serve
+MAX_SEQ_LENGTHS = {
+    "sentence-transformers/all-MiniLM-L6-v2": 256,
+    "sentence-transformers/all-mpnet-base-v2": 384,
+}
+
+
+def export_onnx_model(model_name: str, model_dir: str, quantize: bool = True) -> str:
+    """
+    Export a Hugging Face encoder to ONNX, optionally with int8 dynamic quantization.
+
+    Torch and transformers are only needed here, at export time. The exported
+    model, tokenizer and metadata are written to ``model_dir``.
+
+    Args:
+        model_name: Hugging Face model id
+        model_dir: Directory to write the exported files to
+        quantize: Whether to quantize weights to int8
+
+    Returns:
+        Path to the ONNX model to serve
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(model_dir, exist_ok=True)
+    logger.info(f"Exporting {model_name} to ONNX in {model_dir}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(model_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    dummy = tokenizer(["Akwaaba to Ghana"], return_tensors="pt")
+    # Graph inputs follow the forward() signature order, so name them in that order
+    input_names = [name for name in inspect.signature(model.forward).parameters if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    # Newer torch releases default to the dynamo exporter, which needs onnxscript
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            ({name: dummy[name] for name in input_names},),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **export_kwargs
+        )
+
+    model_path = fp32_path
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+
+    max_length = min(MAX_SEQ_LENGTHS.get(model_name, 512), tokenizer.model_max_length)
+    with open(os.path.join(model_dir, "meta.json"), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "model_file": os.path.basename(model_path),
+            "max_length": max_length,
+            "pad_token": tokenizer.pad_token
+        }, f)
+
+    logger.info(f"Exported {model_name} to {model_path}")
+    return model_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformers compatible embeddings served by ONNX Runtime.
+
+    Applies the same mean pooling and L2 normalization as the sentence-transformers
+    MiniLM/mpnet pipelines, using the ``tokenizers`` library so torch stays off the
+    hot path. The model is exported on first use if it is not on disk yet.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str = DEFAULT_ONNX_DIR,
+        quantize: bool = True,
+        batch_size: int = 32,
+        num_threads: int = 0
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        suffix = "int8" if quantize else "fp32"
+        self.model_dir = os.path.join(cache_dir, f"{model_name.replace('/', '__')}-{suffix}")
+
+        meta_path = os.path.join(self.model_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            export_onnx_model(model_name, self.model_dir, quantize=quantize)
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=meta["max_length"])
+        pad_token = meta["pad_token"]
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token), pad_token=pad_token)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            os.path.join(self.model_dir, meta["model_file"]),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        # The tokenizer is not safe to share between threads while padding is configured
+        self._lock = threading.Lock()
+        logger.info(f"Loaded ONNX embeddings for {model_name} from {self.model_dir}")
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Tokenize, run the encoder, then mean-pool and normalize"""
+        with self._lock:
+            encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents in length-sorted batches to keep padding small"""
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self._embed_batch([text])[0].tolist()
+
+
+def check_parity(model_name: str, texts: List[str], quantize: bool = True) -> Dict:
+    """
+    Compare ONNX vectors against the torch sentence-transformers vectors.
+
+    Returns:
+        Dictionary with the minimum and mean cosine similarity between the two backends
+    """
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    torch_vectors = np.array(HuggingFaceEmbeddings(model_name=model_name).embed_documents(texts))
+    onnx_vectors = np.array(OnnxEmbeddings(model_name, quantize=quantize).embed_documents(texts))
+
+    torch_vectors /= np.linalg.norm(torch_vectors, axis=1, keepdims=True)
+    cosines = (torch_vectors * onnx_vectors).sum(axis=1)
+    return {
+        "model": model_name,
+        "quantized": quantize,
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean())
+    }
+
+
+if __name__ == "__main__":
+    # Parity check against the torch backend:
+    #   python -m utils.onnx_embeddings [model_name ...]
+    logging.basicConfig(level=logging.INFO)
+    sample_texts = [
+        "Akwaaba means welcome in Twi.",
+        "What does the proverb 'Obi nkyere abofra Nyame' mean?",
+        "Senior software engineer with Python, FastAPI and AWS experience in Accra.",
+        "Kumasi is the capital of the Ashanti Region.",
+        "Upload a PDF and ask questions about its content.",
+    ]
+    threshold = float(os.getenv("EMBEDDING_ONNX_PARITY_THRESHOLD", "0.98"))
+    models = sys.argv[1:] or list(MAX_SEQ_LENGTHS.keys())
+    failed = False
+    for name in models:
+        result = check_parity(name, sample_texts)
+        print(json.dumps(result))
+        failed = failed or result["min_cosine"] < threshold
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from langchain_community.vectorstores import FAISS
+
+from utils.faiss_storage import save_faiss_store
+
+logger = logging.getLogger(__name__)
+
+# Where document-QA sessions live: "memory" keeps them in this process (one worker
+# only), "sqlite" shares them between every worker on the box through SESSION_STORE_PATH
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join("data", "sessions"))
+# Upload jobs remembered per session for status polling
+SESSION_MAX_JOBS = int(os.getenv("SESSION_MAX_JOBS", "50"))
+
+
+class SessionBackend(ABC):
+    """
+    Source of truth for document-QA session metadata and indexes.
+
+    Every session has a version that is bumped each time its index is saved. Workers
+    keep the sessions they serve in a hot cache and reload a session's index when
+    the backend reports a newer version than the one they hold.
+    """
+
+    # Whether other processes see the sessions (and their indexes) stored here
+    shared = False
+
+    @abstractmethod
+    def create(self, session_id: str, now: datetime):
+        ...
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Metadata (created_at, last_accessed, version, document_count) or None"""
+
+    @abstractmethod
+    def touch(self, session_id: str, now: datetime):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def expired(self, cutoff: datetime) -> List[str]:
+        """Sessions last accessed before cutoff"""
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def lock(self, session_id: str):
+        """Lock serializing writers of a session (acquire()/release())"""
+
+    @abstractmethod
+    def save_index(self, session_id: str, vector_store: Optional[FAISS], document_count: int) -> int:
+        """
+        Publish a new version of a session's index; call with the session's lock held
+
+        Args:
+            session_id: Session to update
+            vector_store: The session's store, or None once it has been reset
+            document_count: Documents uploaded to the session
+
+        Returns:
+            The new version
+        """
+
+    @abstractmethod
+    def index_path(self, session_id: str, version: int) -> Optional[str]:
+        """Directory holding a version of the index, or None if it has no index"""
+
+    @abstractmethod
+    def save_job(self, session_id: str, job: Dict):
+        """Record the state of an upload job (a dict with at least job_id and created_at)"""
+
+    @abstractmethod
+    def jobs(self, session_id: str) -> List[Dict]:
+        """The session's most recent upload jobs, oldest first"""
+
+
+class MemorySessionBackend(SessionBackend):
+    """Process-local sessions; indexes stay in the worker's memory"""
+
+    def __init__(self):
+        self.sessions: Dict[str, Dict] = {}
+        self.locks: Dict[str, threading.Lock] = {}
+        self.session_jobs: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, session_id: str, now: datetime):
+        self.sessions[session_id] = {"created_at": now, "last_accessed": now, "version": 0, "document_count": 0}
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        meta = self.sessions.get(session_id)
+        return dict(meta) if meta is not None else None
+
+    def touch(self, session_id: str, now: datetime):
+        if session_id in self.sessions:
+            self.sessions[session_id]["last_accessed"] = now
+
+    def delete(self, session_id: str):
+        self.sessions.pop(session_id, None)
+        self.locks.pop(session_id, None)
+        self.session_jobs.pop(session_id, None)
+
+    def expired(self, cutoff: datetime) -> List[str]:
+        return [sid for sid, meta in self.sessions.items() if meta["last_accessed"] < cutoff]
+
+    def count(self) -> int:
+        return len(self.sessions)
+
+    def lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            return self.locks.setdefault(session_id, threading.Lock())
+
+    def save_index(self, session_id: str, vector_store: Optional[FAISS], document_count: int) -> int:
+        # The worker's own copy is the only one, so there is nothing to write
+        meta = self.sessions[session_id]
+        meta["version"] += 1
+        meta["document_count"] = document_count
+        return meta["version"]
+
+    def index_path(self, session_id: str, version: int) -> Optional[str]:
+        return None
+
+    def save_job(self, session_id: str, job: Dict):
+        with self._lock:
+            jobs = self.session_jobs.setdefault(session_id, {})
+            jobs[job["job_id"]] = dict(job)
+            for job_id in list(jobs)[:max(0, len(jobs) - SESSION_MAX_JOBS)]:
+                del jobs[job_id]
+
+    def jobs(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            return [dict(job) for job in self.session_jobs.get(session_id, {}).values()]
+
+
+class FileLock:
+    """Cross-process exclusive lock on a file (flock), usable from threads"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        self.fd = fd
+
+    def release(self):
+        fd, self.fd = self.fd, None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+class SqliteSessionBackend(SessionBackend):
+    """
+    Sessions shared by every worker on the machine.
+
+    Metadata lives in SQLite; each index version is a save_faiss_store directory.
+    Layout of ``root``::
+
+        sessions.db                      id, timestamps, version, document count
+        indexes/<session_id>/v<version>/ index of each published version
+        locks/<session_id>.lock          flock taken by writers of the session
+
+    The previous version is kept when a new one is published, so a worker that is
+    still loading it is not pulled from under.
+    """
+
+    shared = True
+
+    def __init__(self, root: str):
+        self.root = root
+        self.db_path = os.path.join(root, "sessions.db")
+        self.indexes_dir = os.path.join(root, "indexes")
+        self.locks_dir = os.path.join(root, "locks")
+        os.makedirs(self.indexes_dir, exist_ok=True)
+        os.makedirs(self.locks_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, created_at REAL, last_accessed REAL, "
+                "version INTEGER NOT NULL DEFAULT 0, document_count INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, session_id TEXT NOT NULL, created_at REAL, data TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session_id, created_at)")
+        logger.info(f"SQLite session backend at {root}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection for one transaction, committed and closed on exit"""
+        # A connection per call keeps the backend safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.indexes_dir, session_id)
+
+    def create(self, session_id: str, now: datetime):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sessions (id, created_at, last_accessed) VALUES (?, ?, ?)",
+                (session_id, now.timestamp(), now.timestamp())
+            )
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT created_at, last_accessed, version, document_count FROM sessions WHERE id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "created_at": datetime.fromtimestamp(row[0]),
+            "last_accessed": datetime.fromtimestamp(row[1]),
+            "version": row[2],
+            "document_count": row[3]
+        }
+
+    def touch(self, session_id: str, now: datetime):
+        with self._connect() as conn:
+            conn.execute("UPDATE sessions SET last_accessed = ? WHERE id = ?", (now.timestamp(), session_id))
+
+    def delete(self, session_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            conn.execute("DELETE FROM jobs WHERE session_id = ?", (session_id,))
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+        try:
+            os.unlink(os.path.join(self.locks_dir, f"{session_id}.lock"))
+        except FileNotFoundError:
+            pass
+
+    def expired(self, cutoff: datetime) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM sessions WHERE last_accessed < ?", (cutoff.timestamp(),)).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def lock(self, session_id: str) -> FileLock:
+        return FileLock(os.path.join(self.locks_dir, f"{session_id}.lock"))
+
+    def save_index(self, session_id: str, vector_store: Optional[FAISS], document_count: int) -> int:
+        meta = self.get(session_id)
+        if meta is None:
+            raise KeyError(f"Session not found: {session_id}")
+        version = meta["version"] + 1
+
+        start = time.perf_counter()
+        if vector_store is not None:
+            save_faiss_store(vector_store, os.path.join(self._session_dir(session_id), f"v{version}"))
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE sessions SET version = ?, document_count = ? WHERE id = ?",
+                (version, document_count, session_id)
+            )
+
+        # Drop versions older than the previous one
+        session_dir = self._session_dir(session_id)
+        if os.path.isdir(session_dir):
+            for name in os.listdir(session_dir):
+                if name.startswith("v") and name[1:].isdigit() and int(name[1:]) < version - 1:
+                    shutil.rmtree(os.path.join(session_dir, name), ignore_errors=True)
+        logger.info(f"Published version {version} of session {session_id} in {time.perf_counter() - start:.2f}s")
+        return version
+
+    def index_path(self, session_id: str, version: int) -> Optional[str]:
+        path = os.path.join(self._session_dir(session_id), f"v{version}")
+        return path if os.path.isdir(path) else None
+
+    def save_job(self, session_id: str, job: Dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, session_id, created_at, data) VALUES (?, ?, ?, ?)",
+                (job["job_id"], session_id, job["created_at"], json.dumps(job, default=str))
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM jobs WHERE session_id = ? ORDER BY created_at DESC LIMIT ?)",
+                (session_id, session_id, SESSION_MAX_JOBS)
+            )
+
+    def jobs(self, session_id: str) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM jobs WHERE session_id = ? ORDER BY created_at", (session_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+def create_session_backend(name: str = SESSION_BACKEND, path: str = SESSION_STORE_PATH) -> SessionBackend:
+    """Build the configured session backend"""
+    if name == "sqlite":
+        return SqliteSessionBackend(path)
+    if name != "memory":
+        logger.warning(f"Unknown SESSION_BACKEND {name}, keeping sessions in memory")
+    return MemorySessionBackend()
@@ -0,0 +1,190 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+# Size limits for uploaded files and whole request bodies (0 disables a limit)
+UPLOAD_MAX_FILE_MB = float(os.getenv("UPLOAD_MAX_FILE_MB", "25"))
+UPLOAD_MAX_REQUEST_MB = float(os.getenv("UPLOAD_MAX_REQUEST_MB", "100"))
+UPLOAD_MAX_FILE_BYTES = int(UPLOAD_MAX_FILE_MB * 1024 * 1024)
+UPLOAD_MAX_REQUEST_BYTES = int(UPLOAD_MAX_REQUEST_MB * 1024 * 1024)
+# Bytes copied per read while spooling; bounds the memory an upload needs
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# Extracted CV texts kept by file hash, so re-uploads of a CV skip parsing
+UPLOAD_TEXT_CACHE_ENTRIES = int(os.getenv("UPLOAD_TEXT_CACHE_ENTRIES", "128"))
+
+
+def _megabytes(size: int) -> str:
+    return f"{round(size / (1024 * 1024), 1):g} MB"
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds its size limit"""
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    filename: str
+    size: int
+    sha256: str
+
+
+async def spool_upload(
+    file: UploadFile,
+    destination: Optional[str] = None,
+    max_bytes: int = UPLOAD_MAX_FILE_BYTES
+) -> SpooledUpload:
+    """
+    Copy an upload to disk in fixed-size chunks, hashing it on the way
+
+    Args:
+        file: The uploaded file
+        destination: Path to write; a temporary file with the upload's extension if omitted
+        max_bytes: Size limit, checked as the file is copied (0 for none)
+
+    Returns:
+        The spooled file; the caller owns it and must delete it
+
+    Raises:
+        UploadTooLarge: If the file exceeds max_bytes (nothing is left on disk)
+    """
+    filename = file.filename or "upload"
+    if destination is None:
+        spool = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1])
+    else:
+        spool = open(destination, "wb")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with spool:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"{filename} is larger than the {_megabytes(max_bytes)} upload limit")
+                digest.update(chunk)
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(spool.name)
+        raise
+    return SpooledUpload(spool.name, filename, size, digest.hexdigest())
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects request bodies over a size limit with 413 while they are still arriving.
+
+    Requests announcing a larger Content-Length are refused before any of the body
+    is read; chunked or understated bodies are cut off as soon as the running byte
+    count passes the limit, so an oversized upload is never fully received.
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise UploadTooLarge(f"Request body is larger than {self.max_bytes} bytes")
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Whatever the app answers to the aborted body is replaced by the 413 below
+            if exceeded and not response_started:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            pass
+        if exceeded and not response_started:
+            logger.warning(f"Rejected {scope.get('path')}: body over {self.max_bytes} bytes")
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Request body is larger than the {_megabytes(self.max_bytes)} limit"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class ExtractedTextCache:
+    """
+    Small LRU of text extracted from uploaded files, keyed by the file's SHA-256
+    and the extractor that produced it (extractors differ in how they join pages)
+    """
+
+    def __init__(self, max_entries: int = UPLOAD_TEXT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, extractor: str, sha256: str) -> Optional[str]:
+        key = (extractor, sha256)
+        with self._lock:
+            text = self.entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, extractor: str, sha256: str, text: str):
+        if self.max_entries <= 0:
+            return
+        key = (extractor, sha256)
+        with self._lock:
+            self.entries[key] = text
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+# Shared by the CV analyzer and the cover letter generator, which parse the same CVs
+extracted_text_cache = ExtractedTextCache()